@@ -0,0 +1,292 @@
+"""
+ABDM Client
+Pooled HTTP client for the ABDM (mock) FHIR server
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import ABDM_REQUEST_SECONDS, ERRORS_TOTAL
+
+
+class ABDMError(Exception):
+    """Base error for ABDM lookups"""
+
+
+class PatientNotFound(ABDMError):
+    """The ABDM server has no patient with this ABHA ID"""
+
+
+class ABDMUnavailable(ABDMError):
+    """The ABDM server could not be reached"""
+
+
+class ABDMTimeout(ABDMError):
+    """The lookup did not finish within its deadline"""
+
+
+class ABDMClient:
+    """
+    Keep-alive client for the ABDM FHIR endpoints
+
+    One requests.Session with a sized connection pool is shared by all
+    callers, and the Patient and MedicationRequest fetches for a login run
+    concurrently on a small thread pool under a single total deadline.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 20, deadline: float = 5.0):
+        self.base_url = base_url.rstrip('/')
+        self.deadline = deadline
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="abdm")
+
+    def _get(self, resource: str, path: str, params: Dict, expires_at: float,
+             etag: Optional[str] = None) -> requests.Response:
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            ERRORS_TOTAL.inc(component="abdm", kind="timeout")
+            raise ABDMTimeout(f"Deadline exceeded before GET {path}")
+        headers = {"If-None-Match": etag} if etag else None
+        return self._send(resource, "GET", path, params=params, headers=headers, timeout=remaining)
+
+    def _send(self, resource: str, method: str, path: str, **kwargs) -> requests.Response:
+        """Issue one request, timing it per resource and mapping transport errors"""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            status = str(response.status_code)
+            return response
+        except requests.exceptions.Timeout as e:
+            ERRORS_TOTAL.inc(component="abdm", kind="timeout")
+            raise ABDMTimeout(f"{method} {path} timed out") from e
+        except requests.exceptions.ConnectionError as e:
+            ERRORS_TOTAL.inc(component="abdm", kind="connection")
+            raise ABDMUnavailable(str(e)) from e
+        finally:
+            ABDM_REQUEST_SECONDS.observe(time.perf_counter() - started, resource=resource, status=status)
+
+    def fetch_patient_record(self, abha_id: str, deadline: Optional[float] = None,
+                             etags: Optional[Dict[str, str]] = None) -> Tuple[Optional[Dict], Dict[str, str]]:
+        """
+        Fetch demographics and medication history concurrently
+
+        Args:
+            abha_id: Patient ABHA ID
+            deadline: Total seconds allowed for the lookup (default: client deadline)
+            etags: ETags from a previous fetch, sent as If-None-Match to revalidate
+
+        Returns:
+            (parsed patient record, ETags) - the record is None when the server
+            answered 304 Not Modified for both resources
+        """
+        budget = deadline if deadline is not None else self.deadline
+        expires_at = time.monotonic() + budget
+        etags = etags or {}
+
+        patient_response, med_response = self._fetch_pair(abha_id, expires_at, budget, etags)
+
+        if patient_response.status_code == 304 and med_response.status_code == 304:
+            return None, etags
+
+        # Only one side changed: fetch the unchanged one in full to rebuild the record
+        if patient_response.status_code == 304 or med_response.status_code == 304:
+            patient_response, med_response = self._fetch_pair(abha_id, expires_at, budget, {})
+
+        if patient_response.status_code == 404:
+            raise PatientNotFound(abha_id)
+        patient_response.raise_for_status()
+        med_response.raise_for_status()
+
+        new_etags = {
+            "patient": patient_response.headers.get("ETag"),
+            "medications": med_response.headers.get("ETag")
+        }
+        return parse_patient_record(patient_response.json(), med_response.json()), new_etags
+
+    def _fetch_pair(self, abha_id: str, expires_at: float, budget: float,
+                    etags: Dict[str, str]) -> Tuple[requests.Response, requests.Response]:
+        """Run the Patient and MedicationRequest GETs concurrently under one deadline"""
+        patient_future = self._executor.submit(
+            self._get, "Patient", "/fhir/Patient", {"identifier": abha_id}, expires_at, etags.get("patient")
+        )
+        med_future = self._executor.submit(
+            self._get, "MedicationRequest", "/fhir/MedicationRequest", {"patient": abha_id},
+            expires_at, etags.get("medications")
+        )
+
+        done, _ = wait(
+            [patient_future, med_future],
+            timeout=max(expires_at - time.monotonic(), 0),
+            return_when=FIRST_EXCEPTION
+        )
+
+        # Surface the Patient outcome first: a 404 there explains everything else
+        for future in (patient_future, med_future):
+            if future in done and future.exception() is not None:
+                raise future.exception()
+        if len(done) < 2:
+            raise ABDMTimeout(f"ABDM lookup for {abha_id} exceeded {budget}s")
+
+        return patient_future.result(), med_future.result()
+
+    def fetch_everything(self, abha_id: str, deadline: Optional[float] = None,
+                         etag: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Fetch demographics and medications in one round trip via Patient/$everything
+
+        Args:
+            abha_id: Patient ABHA ID
+            deadline: Total seconds allowed for the lookup (default: client deadline)
+            etag: ETag from a previous fetch, sent as If-None-Match to revalidate
+
+        Returns:
+            (parsed patient record, ETag) - the record is None on 304 Not Modified
+        """
+        budget = deadline if deadline is not None else self.deadline
+        response = self._get(
+            "everything", f"/fhir/Patient/{abha_id}/$everything", {}, time.monotonic() + budget, etag
+        )
+
+        if response.status_code == 304:
+            return None, etag
+        if response.status_code == 404:
+            raise PatientNotFound(abha_id)
+        response.raise_for_status()
+
+        return parse_everything_bundle(response.json()), response.headers.get("ETag")
+
+    def fetch_everything_batch(self, abha_ids: List[str],
+                               deadline: Optional[float] = None) -> Dict[str, Tuple[Optional[Dict], Optional[str]]]:
+        """
+        Fetch many patients in one round trip with a FHIR batch Bundle
+
+        Args:
+            abha_ids: Patient ABHA IDs
+            deadline: Total seconds allowed for the request (default: client deadline)
+
+        Returns:
+            ABHA ID -> (parsed patient record or None if not found, ETag)
+        """
+        budget = deadline if deadline is not None else self.deadline
+        bundle = {
+            "resourceType": "Bundle",
+            "type": "batch",
+            "entry": [
+                {"request": {"method": "GET", "url": f"Patient/{abha_id}/$everything"}}
+                for abha_id in abha_ids
+            ]
+        }
+
+        response = self._send("batch", "POST", "/fhir", json=bundle, timeout=budget)
+        response.raise_for_status()
+
+        records = {}
+        for abha_id, entry in zip(abha_ids, response.json().get('entry', [])):
+            status = entry.get('response', {}).get('status', '')
+            if status.startswith('200') and 'resource' in entry:
+                records[abha_id] = (parse_everything_bundle(entry['resource']), entry['response'].get('etag'))
+            else:
+                records[abha_id] = (None, None)
+        return records
+
+    def fetch_patient_page(self, cursor: Optional[str] = None, count: int = 500,
+                           deadline: Optional[float] = None) -> Tuple[List[Dict], Optional[str], int]:
+        """
+        Fetch one page of all patients, with their medications
+
+        Args:
+            cursor: Cursor from the previous page's "next" link (None for the first page)
+            count: Patients per page
+            deadline: Total seconds allowed for the request (default: client deadline)
+
+        Returns:
+            (parsed patient records, cursor for the next page or None at the end, total patients)
+        """
+        budget = deadline if deadline is not None else self.deadline
+        params = {"_count": count, "_revinclude": "MedicationRequest:patient"}
+        if cursor is not None:
+            params["_cursor"] = cursor
+
+        response = self._get("patient_page", "/fhir/Patient", params, time.monotonic() + budget)
+        response.raise_for_status()
+        bundle = response.json()
+
+        next_cursor = None
+        for link in bundle.get('link', []):
+            if link.get('relation') == 'next':
+                next_cursor = dict(parse_qsl(urlsplit(link['url']).query)).get('_cursor')
+        return parse_search_bundle(bundle), next_cursor, bundle.get('total', 0)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def parse_medications(med_data: Dict) -> List[Dict]:
+    """Extract the medication list from a FHIR MedicationRequest Bundle"""
+    medications = []
+    for entry in med_data.get('entry') or []:
+        resource = entry['resource']
+        medications.append({
+            "name": resource['medicationCodeableConcept']['text'],
+            "dosage": resource['dosageInstruction'][0]['text'],
+            "status": resource['status'],
+            "start_date": resource['authoredOn']
+        })
+    return medications
+
+
+def parse_patient_record(patient_data: Dict, med_data: Dict) -> Dict:
+    """Build the API's patient record from FHIR Patient + MedicationRequest data"""
+    return {
+        "abha_id": patient_data['id'],
+        "name": patient_data['name'][0]['text'],
+        "age": patient_data.get('age'),
+        "gender": patient_data['gender'],
+        "medications": parse_medications(med_data)
+    }
+
+
+def parse_search_bundle(bundle: Dict) -> List[Dict]:
+    """Build patient records from a Patient searchset Bundle with revincluded MedicationRequests"""
+    patients: Dict[str, Dict] = {}
+    med_entries: Dict[str, List[Dict]] = {}
+    for entry in bundle.get('entry') or []:
+        resource = entry['resource']
+        if resource.get('resourceType') == 'Patient':
+            patients[resource['id']] = resource
+        elif resource.get('resourceType') == 'MedicationRequest':
+            patient_id = resource['subject']['reference'].partition('/')[2]
+            med_entries.setdefault(patient_id, []).append(entry)
+
+    return [
+        parse_patient_record(patient_data, {"entry": med_entries.get(patient_id, [])})
+        for patient_id, patient_data in patients.items()
+    ]
+
+
+def parse_everything_bundle(bundle: Dict) -> Dict:
+    """Build the API's patient record from a Patient/$everything Bundle"""
+    patient_data = None
+    med_entries = []
+    for entry in bundle.get('entry') or []:
+        resource_type = entry['resource'].get('resourceType')
+        if resource_type == 'Patient':
+            patient_data = entry['resource']
+        elif resource_type == 'MedicationRequest':
+            med_entries.append(entry)
+
+    if patient_data is None:
+        raise ABDMError("$everything Bundle has no Patient resource")
+    return parse_patient_record(patient_data, {"entry": med_entries})
@@ -4,139 +4,604 @@ Uses ChromaDB for vector storage and RAG for intelligent analysis
 """
 
 import chromadb
-from typing import List, Dict
-import json
-
-# Initialize ChromaDB client (in-memory)
-chroma_client = chromadb.Client()
-
-# Create collection for medical rules
-try:
-    collection = chroma_client.get_collection("medical_rules")
-except:
-    collection = chroma_client.create_collection(
-        name="medical_rules",
-        metadata={"description": "Drug interaction rules and guidelines"}
-    )
+from typing import List, Dict, Tuple, Optional
+import os
+import sys
+import threading
+import time
+import weakref
+from datetime import datetime
+from chromadb.api.client import SharedSystemClient
+from chromadb.utils import embedding_functions
+from result_cache import TTLCache
+from rule_index import RuleIndex, severity_key
+from rule_matrix import RuleMatrix
+from metrics import STAGE_SECONDS, RULES_LOADED
+from profiling import startup_phase
+from rule_schema import (
+    RULE_STORE_PATH, COLLECTION_NAME, COLLECTION_DESCRIPTION, CONTENT_HASH_FIELD,
+    open_rule_collection, store_lock, stored_rule_set_version,
+    rule_document, rule_content_hash, compute_rule_set_version
+)
+
+BUILD_BATCH_SIZE = 256
+
+# Sample drug interaction rules
+# In production, this would load from a comprehensive medical database
+MEDICAL_RULES = [
+    {
+        "id": "rule_001",
+        "interaction": "Aspirin + Warfarin",
+        "risk_level": "High",
+        "patient_explanation": "Taking aspirin with warfarin can increase your risk of bleeding. This combination can make it harder for your blood to clot, which could lead to serious bleeding problems.",
+        "doctor_explanation": "Concurrent use of aspirin and warfarin significantly increases bleeding risk due to additive antiplatelet and anticoagulant effects. Monitor INR closely and consider alternative analgesics. Risk of major hemorrhage increases 2-3 fold.",
+        "source": "FDA Drug Interaction Database - Anticoagulant Guidelines 2025",
+        "mechanism": "Synergistic inhibition of platelet aggregation and coagulation cascade"
+    },
+    {
+        "id": "rule_002",
+        "interaction": "Ibuprofen + Aspirin",
+        "risk_level": "Moderate",
+        "patient_explanation": "Taking ibuprofen with aspirin may reduce the heart-protective effects of aspirin and can increase the risk of stomach problems like ulcers or bleeding.",
+        "doctor_explanation": "Ibuprofen can interfere with aspirin's irreversible platelet inhibition, potentially reducing cardioprotective benefits. Additionally, dual NSAID therapy increases GI bleeding risk and may exacerbate renal dysfunction.",
+        "source": "American Heart Association - NSAID Interaction Guidelines",
+        "mechanism": "Competitive inhibition of COX-1 enzyme binding site"
+    },
+    {
+        "id": "rule_003",
+        "interaction": "Metformin + Alcohol",
+        "risk_level": "Moderate",
+        "patient_explanation": "Drinking alcohol while taking metformin can increase the risk of a serious condition called lactic acidosis, which can cause weakness, trouble breathing, and irregular heartbeat.",
+        "doctor_explanation": "Alcohol consumption with metformin increases risk of lactic acidosis, particularly in patients with renal impairment. Ethanol inhibits gluconeogenesis, potentially causing hypoglycemia. Advise patients to limit alcohol intake.",
+        "source": "Endocrine Society - Diabetes Medication Safety 2025",
+        "mechanism": "Impaired lactate clearance and hepatic gluconeogenesis inhibition"
+    },
+    {
+        "id": "rule_004",
+        "interaction": "Lisinopril + Potassium Supplements",
+        "risk_level": "High",
+        "patient_explanation": "Taking potassium supplements with lisinopril can cause dangerously high potassium levels in your blood, which can affect your heart rhythm and may be life-threatening.",
+        "doctor_explanation": "ACE inhibitors like lisinopril reduce aldosterone secretion, leading to potassium retention. Concurrent potassium supplementation can cause severe hyperkalemia (K+ >6.0 mEq/L), risking cardiac arrhythmias. Monitor serum potassium regularly.",
+        "source": "ACC/AHA Hypertension Guidelines - Drug Interactions",
+        "mechanism": "Reduced renal potassium excretion via aldosterone suppression"
+    },
+    {
+        "id": "rule_005",
+        "interaction": "Atorvastatin + Grapefruit Juice",
+        "risk_level": "Moderate",
+        "patient_explanation": "Grapefruit juice can increase the amount of atorvastatin in your blood, which may increase the risk of side effects like muscle pain or liver problems.",
+        "doctor_explanation": "Grapefruit juice inhibits CYP3A4 enzyme in the intestinal wall, increasing atorvastatin bioavailability by up to 260%. This elevates risk of myopathy and rhabdomyolysis. Advise patients to avoid grapefruit products or switch to pravastatin/rosuvastatin.",
+        "source": "Clinical Pharmacology - Statin Interaction Database",
+        "mechanism": "CYP3A4 inhibition leading to increased drug plasma concentrations"
+    },
+    {
+        "id": "rule_006",
+        "interaction": "Lisinopril + Hydrochlorothiazide + Ibuprofen",
+        "risk_level": "High",
+        "patient_explanation": "Taking ibuprofen while you are on both lisinopril and a water pill like hydrochlorothiazide can suddenly damage your kidneys, especially if you are dehydrated or older.",
+        "doctor_explanation": "The \"triple whammy\": an ACE inhibitor plus a thiazide diuretic plus an NSAID markedly raises the risk of acute kidney injury, highest in the first 30 days of NSAID use. Avoid the NSAID (prefer paracetamol); if unavoidable, check renal function and electrolytes within a week.",
+        "source": "BMJ 2013;346:e8525 - Nested case-control study of ACE/ARB, diuretic and NSAID co-prescription",
+        "mechanism": "Efferent arteriolar dilation, volume depletion and afferent prostaglandin inhibition together collapse glomerular filtration pressure"
+    }
+]
+
+BUILTIN_RULE_SET_VERSION = compute_rule_set_version(MEDICAL_RULES)
 
-def load_medical_rules():
+# Initialize ChromaDB client (persistent, on disk)
+with startup_phase("chroma_client"):
+    chroma_client = chromadb.PersistentClient(path=RULE_STORE_PATH)
+with startup_phase("embedding_function"):
+    embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+
+# Vector fallback tuning: nearest rules inspected per pair, pairs per query
+VECTOR_N_RESULTS = int(os.environ.get("PRISMCARE_VECTOR_N_RESULTS", "1"))
+VECTOR_BATCH_SIZE = int(os.environ.get("PRISMCARE_VECTOR_BATCH_SIZE", "64"))
+# "chroma": HNSW search in Chroma; "numpy": exact scoring against an in-memory
+# matrix of every rule embedding (one matrix product per batch)
+VECTOR_BACKEND = os.environ.get("PRISMCARE_VECTOR_BACKEND", "chroma")
+
+# Memoized pair resolutions (matched rules and path per current medication),
+# keyed on rule set version + medication set + candidate
+RESULT_CACHE_SIZE = int(os.environ.get("PRISMCARE_RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_TTL = float(os.environ.get("PRISMCARE_RESULT_CACHE_TTL", "300"))
+_result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+# Which lookup answered a pair
+PATH_INDEX = "index"
+PATH_VECTOR = "vector"
+
+class RuleSnapshot:
     """
-    Load sample drug interaction rules into ChromaDB
-    In production, this would load from a comprehensive medical database
+    One loaded version of the rule set: everything a request reads
+    
+    - index: exact rule index over canonical drug IDs (aliases, brands, salt
+      forms and doses normalized), so known names resolve without a vector search
+    - matrix: every rule embedding in memory (numpy backend only)
+    - collection: the Chroma collection the vector fallback queries
+    - system: the Chroma System behind that collection (HNSW index, SQLite
+      handles), stopped once a reload has replaced this snapshot and the
+      last request using it has finished
+    
+    Never modified once built. A request reads SNAPSHOT once and uses that
+    object throughout, so a reload swapping in a new snapshot can't change
+    the rules under an in-flight request; the old one is freed when the last
+    request holding it finishes.
     """
-    rules = [
-        {
-            "id": "rule_001",
-            "interaction": "Aspirin + Warfarin",
-            "risk_level": "High",
-            "patient_explanation": "Taking aspirin with warfarin can increase your risk of bleeding. This combination can make it harder for your blood to clot, which could lead to serious bleeding problems.",
-            "doctor_explanation": "Concurrent use of aspirin and warfarin significantly increases bleeding risk due to additive antiplatelet and anticoagulant effects. Monitor INR closely and consider alternative analgesics. Risk of major hemorrhage increases 2-3 fold.",
-            "source": "FDA Drug Interaction Database - Anticoagulant Guidelines 2025",
-            "mechanism": "Synergistic inhibition of platelet aggregation and coagulation cascade"
-        },
-        {
-            "id": "rule_002",
-            "interaction": "Ibuprofen + Aspirin",
-            "risk_level": "Moderate",
-            "patient_explanation": "Taking ibuprofen with aspirin may reduce the heart-protective effects of aspirin and can increase the risk of stomach problems like ulcers or bleeding.",
-            "doctor_explanation": "Ibuprofen can interfere with aspirin's irreversible platelet inhibition, potentially reducing cardioprotective benefits. Additionally, dual NSAID therapy increases GI bleeding risk and may exacerbate renal dysfunction.",
-            "source": "American Heart Association - NSAID Interaction Guidelines",
-            "mechanism": "Competitive inhibition of COX-1 enzyme binding site"
-        },
-        {
-            "id": "rule_003",
-            "interaction": "Metformin + Alcohol",
-            "risk_level": "Moderate",
-            "patient_explanation": "Drinking alcohol while taking metformin can increase the risk of a serious condition called lactic acidosis, which can cause weakness, trouble breathing, and irregular heartbeat.",
-            "doctor_explanation": "Alcohol consumption with metformin increases risk of lactic acidosis, particularly in patients with renal impairment. Ethanol inhibits gluconeogenesis, potentially causing hypoglycemia. Advise patients to limit alcohol intake.",
-            "source": "Endocrine Society - Diabetes Medication Safety 2025",
-            "mechanism": "Impaired lactate clearance and hepatic gluconeogenesis inhibition"
-        },
-        {
-            "id": "rule_004",
-            "interaction": "Lisinopril + Potassium Supplements",
-            "risk_level": "High",
-            "patient_explanation": "Taking potassium supplements with lisinopril can cause dangerously high potassium levels in your blood, which can affect your heart rhythm and may be life-threatening.",
-            "doctor_explanation": "ACE inhibitors like lisinopril reduce aldosterone secretion, leading to potassium retention. Concurrent potassium supplementation can cause severe hyperkalemia (K+ >6.0 mEq/L), risking cardiac arrhythmias. Monitor serum potassium regularly.",
-            "source": "ACC/AHA Hypertension Guidelines - Drug Interactions",
-            "mechanism": "Reduced renal potassium excretion via aldosterone suppression"
+    
+    def __init__(self, version: Optional[str], collection, index: RuleIndex,
+                 matrix: Optional[RuleMatrix], loaded_at: str, system=None):
+        self.version = version
+        self.collection = collection
+        self.system = system
+        self.index = index
+        self.matrix = matrix
+        self.loaded_at = loaded_at
+        self.rules_by_id = {rule['id']: rule for rule in index.rules}
+    
+    def __len__(self) -> int:
+        return len(self.index.rules)
+    
+    def with_collection(self, collection, system=None) -> "RuleSnapshot":
+        """The same rules, queried through another collection handle"""
+        return RuleSnapshot(self.version, collection, self.index, self.matrix, self.loaded_at, system)
+
+# Rule set currently served; replaced whole by load_medical_rules()/reload_rules()
+SNAPSHOT = RuleSnapshot(None, None, RuleIndex([]), None, datetime.now().isoformat())
+_reload_lock = threading.Lock()
+
+def client_system(client):
+    """
+    The Chroma System a client was created on
+    
+    Call right after creating the client: Client._system looks the System
+    up by path, so after clear_system_cache() it names the newer one.
+    """
+    return getattr(client, "_system", None)
+
+def normalize_drug_name(name: str) -> str:
+    """Normalize a drug name for index lookups (case and whitespace insensitive)"""
+    return " ".join(name.lower().split())
+
+def build_rule_store(rules: List[Dict] = MEDICAL_RULES, source: str = "builtin", client=None) -> str:
+    """
+    Embed a rule set and write it to the persistent store, replacing what is there
+    (the caller holds store_lock())
+    
+    Args:
+        rules: Rule metadata dicts
+        source: Where the rules came from (recorded in the store metadata)
+        client: Chroma client to write through (default: this process's client)
+        
+    Returns:
+        Version stamp of the stored rule set
+    """
+    client = client or chroma_client
+    version = compute_rule_set_version(rules)
+    started = time.perf_counter()
+    
+    try:
+        client.delete_collection(COLLECTION_NAME)
+    except Exception:
+        pass
+    collection = client.create_collection(
+        name=COLLECTION_NAME,
+        metadata={
+            "description": COLLECTION_DESCRIPTION,
+            "rule_set_version": version,
+            "rule_source": source,
+            "built_at": datetime.now().isoformat()
         },
-        {
-            "id": "rule_005",
-            "interaction": "Atorvastatin + Grapefruit Juice",
-            "risk_level": "Moderate",
-            "patient_explanation": "Grapefruit juice can increase the amount of atorvastatin in your blood, which may increase the risk of side effects like muscle pain or liver problems.",
-            "doctor_explanation": "Grapefruit juice inhibits CYP3A4 enzyme in the intestinal wall, increasing atorvastatin bioavailability by up to 260%. This elevates risk of myopathy and rhabdomyolysis. Advise patients to avoid grapefruit products or switch to pravastatin/rosuvastatin.",
-            "source": "Clinical Pharmacology - Statin Interaction Database",
-            "mechanism": "CYP3A4 inhibition leading to increased drug plasma concentrations"
-        }
-    ]
+        embedding_function=embedding_fn
+    )
     
-    # Check if collection is empty
-    if collection.count() == 0:
-        # Add rules to ChromaDB
+    for start in range(0, len(rules), BUILD_BATCH_SIZE):
+        chunk = [
+            dict(rule, **{CONTENT_HASH_FIELD: rule_content_hash(rule)})
+            for rule in rules[start:start + BUILD_BATCH_SIZE]
+        ]
+        documents = [rule_document(rule) for rule in chunk]
         collection.add(
-            documents=[f"{rule['interaction']} - {rule['patient_explanation']}" for rule in rules],
-            metadatas=rules,
-            ids=[rule['id'] for rule in rules]
+            documents=documents,
+            embeddings=embedding_fn(documents),
+            metadatas=chunk,
+            ids=[rule['id'] for rule in chunk]
         )
-        print(f"✅ Loaded {len(rules)} medical rules into ChromaDB")
+    
+    print(f"✅ Embedded {len(rules)} medical rules into {RULE_STORE_PATH} "
+          f"(version {version}, {time.perf_counter() - started:.2f}s)")
+    return version
+
+def load_snapshot(client, system=None) -> Tuple[RuleSnapshot, bool]:
+    """
+    Open the persistent rule store and build a snapshot of it
+    
+    The store is (re)built only when it is empty or still holds an older
+    version of the built-in rules; otherwise the stored embeddings are reused.
+    Runs under store_lock(), so with several processes only the first one
+    rebuilds and the rest see the rebuilt store.
+    
+    Args:
+        client: Chroma client to read through
+        system: That client's System (see client_system)
+        
+    Returns:
+        (snapshot, True if the store had to be built)
+    """
+    started = time.perf_counter()
+    # One process at a time: a rebuild must not race another process's rebuild or read
+    with store_lock():
+        collection = open_rule_collection(client, embedding_fn)
+        stored = collection.metadata or {}
+        built = False
+        
+        if collection.count() == 0 or (
+            stored.get("rule_source", "builtin") == "builtin"
+            and stored.get("rule_set_version") != BUILTIN_RULE_SET_VERSION
+        ):
+            build_rule_store(client=client)
+            collection = open_rule_collection(client, embedding_fn)
+            built = True
+        else:
+            print(f"ℹ️  Reopened rule store ({collection.count()} rules, "
+                  f"version {stored.get('rule_set_version')})")
+        
+        index = RuleIndex(collection.get(include=["metadatas"])['metadatas'] or [])
+        matrix = None
+        if VECTOR_BACKEND == "numpy":
+            matrix_started = time.perf_counter()
+            matrix = RuleMatrix.from_collection(collection)
+            print(f"🧮 Rule matrix ready ({len(matrix)} rules, {matrix.nbytes / 1e6:.1f} MB, "
+                  f"{(time.perf_counter() - matrix_started) * 1000:.1f}ms)")
+        
+        version = (collection.metadata or {}).get("rule_set_version")
+    
+    snapshot = RuleSnapshot(version, collection, index, matrix, datetime.now().isoformat(), system)
+    print(f"🔑 Rule index ready ({len(index.rules)} rules, {len(index)} pairs, "
+          f"{len(index.normalizer)} drugs, "
+          f"{(time.perf_counter() - started) * 1000:.1f}ms)")
+    return snapshot, built
+
+def _publish(snapshot: RuleSnapshot):
+    """Make a snapshot the one new requests use (a single reference assignment)"""
+    global SNAPSHOT
+    SNAPSHOT = snapshot
+    # Entries are keyed by version, so this only frees memory early
+    _result_cache.clear()
+    RULES_LOADED.set(len(snapshot))
+
+def load_medical_rules() -> bool:
+    """
+    Load the rule store into this process's first snapshot
+    
+    Returns:
+        True if the store had to be built in this process
+    """
+    snapshot, built = load_snapshot(chroma_client, client_system(chroma_client))
+    _publish(snapshot)
+    return built
+
+def reload_rules() -> Dict:
+    """
+    Build a snapshot of the rule store as it is now and swap it in
+    
+    Runs alongside requests: they keep using the snapshot they started with.
+    A fresh Chroma client is opened so rules written by another process
+    (e.g. ingest_rules.py) are seen; the old client stays usable by
+    in-flight requests, and its System is stopped once they drop the old
+    snapshot.
+    
+    Returns:
+        Previous and new version, rule count and how long the build took
+    """
+    global chroma_client
+    
+    with _reload_lock:
+        started = time.perf_counter()
+        previous = SNAPSHOT
+        
+        SharedSystemClient.clear_system_cache()
+        client = chromadb.PersistentClient(path=RULE_STORE_PATH)
+        system = client_system(client)
+        try:
+            snapshot, built = load_snapshot(client, system)
+        except Exception:
+            if system is not None:
+                system.stop()
+            raise
+        
+        chroma_client = client
+        _publish(snapshot)
+        if previous.system is not None and previous.system is not system:
+            weakref.finalize(previous, previous.system.stop)
+        return {
+            "previous_version": previous.version,
+            "rule_set_version": snapshot.version,
+            "rules": len(snapshot),
+            "rebuilt_store": built,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+def store_version() -> Optional[str]:
+    """
+    Version stamped on the rule store right now (may be ahead of SNAPSHOT)
+    Read-only; None while the store has no collection.
+    """
+    return stored_rule_set_version(chroma_client)
+
+def lookup_pair(current_med: str, new_medicine: str,
+                snapshot: Optional[RuleSnapshot] = None) -> Optional[List[Dict]]:
+    """
+    Resolve one drug pair from the exact index
+    
+    Args:
+        current_med: Medication the patient is already taking
+        new_medicine: New medicine to check
+        snapshot: Rule set to use (default: the current one)
+        
+    Returns:
+        Matching rules, or None if the index can't answer for these names
+    """
+    return (snapshot or SNAPSHOT).index.lookup(current_med, new_medicine)
+
+def resolve_pairs(pairs: List[Tuple[str, str]], n_results: Optional[int] = None,
+                  snapshot: Optional[RuleSnapshot] = None) -> List[Tuple[List[Dict], str]]:
+    """
+    Resolve drug pairs, sending everything the index can't answer to ChromaDB
+    as batched queries
+    
+    Args:
+        pairs: (current medication, new medicine) tuples
+        n_results: Nearest rules to inspect per vector query
+        snapshot: Rule set to use (default: the current one)
+        
+    Returns:
+        (matching rules, path) per input pair, in order - path is "index" or "vector"
+    """
+    snapshot = snapshot or SNAPSHOT
+    resolved: List[Optional[Tuple[List[Dict], str]]] = [None] * len(pairs)
+    fallback = []
+    
+    with STAGE_SECONDS.time(stage="index_lookup"):
+        for i, (current_med, new_medicine) in enumerate(pairs):
+            rules = snapshot.index.lookup(current_med, new_medicine)
+            if rules is None:
+                fallback.append(i)
+            else:
+                resolved[i] = (rules, PATH_INDEX)
+    
+    for start in range(0, len(fallback), VECTOR_BATCH_SIZE):
+        batch = fallback[start:start + VECTOR_BATCH_SIZE]
+        matches = _vector_lookup_batch([pairs[i] for i in batch], n_results or VECTOR_N_RESULTS, snapshot)
+        for i, rules in zip(batch, matches):
+            resolved[i] = (rules, PATH_VECTOR)
+    
+    return resolved
+
+def _rule_matches(metadata: Dict, current_med: str, new_medicine: str) -> bool:
+    """Check if a rule's "A + B" interaction covers the pair (either direction)"""
+    interaction_parts = metadata['interaction'].lower().split(' + ')
+    if len(interaction_parts) != 2:
+        return False
+    
+    current_lower = current_med.lower()
+    new_lower = new_medicine.lower()
+    
+    return (current_lower in interaction_parts[0] and new_lower in interaction_parts[1]) or \
+           (new_lower in interaction_parts[0] and current_lower in interaction_parts[1])
+
+def _vector_lookup_batch(pairs: List[Tuple[str, str]], n_results: int,
+                         snapshot: RuleSnapshot) -> List[List[Dict]]:
+    """
+    Fall back to similarity search for names the index doesn't know
+    
+    All pairs are embedded together and go out as one Chroma query (or one
+    matrix product with the numpy backend); each pair's top hits are matched
+    back against that pair only. Hits are mapped onto the snapshot's own
+    rules, so a store being rewritten underneath can't leak newer rules in.
+    """
+    query_texts = [f"{current_med} + {new_medicine}" for current_med, new_medicine in pairs]
+    
+    # Embed explicitly so embedding and ANN search time are measured separately
+    with STAGE_SECONDS.time(stage="embedding"):
+        query_embeddings = embedding_fn(query_texts)
+    
+    if not len(snapshot):
+        return [[] for _ in pairs]
+    
+    if snapshot.matrix is not None:
+        with STAGE_SECONDS.time(stage="matrix_score"):
+            hits_per_pair = snapshot.matrix.top_k(query_embeddings, n_results)
     else:
-        print(f"ℹ️  Medical rules already loaded ({collection.count()} rules)")
+        with STAGE_SECONDS.time(stage="vector_query"):
+            results = snapshot.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=max(1, min(n_results, len(snapshot)))
+            )
+        hits_per_pair = results['metadatas'] or [[] for _ in pairs]
+    
+    matches = []
+    for (current_med, new_medicine), hits in zip(pairs, hits_per_pair):
+        rules = [snapshot.rules_by_id.get(m['id']) for m in hits]
+        matches.append([m for m in rules if m and _rule_matches(m, current_med, new_medicine)])
+    return matches
 
-def analyze_prescription(medication_history: List[str], new_medicine: str) -> Dict:
+def analyze_prescription(medication_history: List[str], new_medicine: str,
+                         n_results: Optional[int] = None) -> Dict:
     """
     Analyze potential drug interactions using RAG
     
     Args:
         medication_history: List of current medications
         new_medicine: New medicine to check
+        n_results: Nearest rules to inspect per vector query (default VECTOR_N_RESULTS)
         
     Returns:
         Dictionary with safety analysis
     """
-    # Ensure rules are loaded
-    if collection.count() == 0:
-        load_medical_rules()
+    result, _ = _analyze_candidates(medication_history, [new_medicine], n_results)[0]
+    return result
+
+def analyze_batch(medication_history: List[str], candidates: List[str],
+                  n_results: Optional[int] = None) -> Dict:
+    """
+    Analyze several candidate medicines against one history in a single pass
     
-    # Build query for vector search
-    interactions_found = []
+    Every candidate x current-medication pair is resolved together, so the
+    vector fallback costs one batched query for the whole request.
     
-    for current_med in medication_history:
-        # Query ChromaDB for potential interactions
-        query = f"{current_med} + {new_medicine}"
-        results = collection.query(
-            query_texts=[query],
-            n_results=1
-        )
+    Args:
+        medication_history: List of current medications
+        candidates: New medicines to check
+        n_results: Nearest rules to inspect per vector query (default VECTOR_N_RESULTS)
+        
+    Returns:
+        Dictionary with per-candidate results and the interaction matrix
+    """
+    analyzed = _analyze_candidates(medication_history, candidates, n_results)
+    
+    return {
+        "rule_set_version": analyzed[0][0]["rule_set_version"] if analyzed else SNAPSHOT.version,
+        "candidates": candidates,
+        "current_medications": medication_history,
+        "results": [result for result, _ in analyzed],
+        "matrix": [
+            [cells[normalize_drug_name(current_med)] for current_med in medication_history]
+            for _, cells in analyzed
+        ]
+    }
+
+def _cache_key(snapshot: RuleSnapshot, medication_history: List[str], candidate: str,
+               n_results: Optional[int]) -> Tuple:
+    """Order-independent cache key for one (history, candidate) analysis"""
+    return (
+        snapshot.version,
+        frozenset(normalize_drug_name(m) for m in medication_history),
+        normalize_drug_name(candidate),
+        n_results or VECTOR_N_RESULTS
+    )
+
+def _analyze_candidates(medication_history: List[str], candidates: List[str],
+                        n_results: Optional[int]) -> List[Tuple[Dict, Dict[str, Dict]]]:
+    """
+    Analyze candidates against one history, serving repeat pair resolutions
+    from the result cache
+    
+    The cache key ignores case, order and duplicates, so only the matched
+    rules are cached; the response is built from them per request, in the
+    caller's own spelling of every drug name.
+    
+    Returns:
+        (result, matrix cells keyed by normalized current medication) per candidate
+    """
+    # Read the current rule set once; a concurrent reload can't change it under us
+    snapshot = SNAPSHOT
+    
+    # Per candidate: normalized current medication -> (matching rules, path)
+    matched: List[Optional[Dict[str, Tuple[List[Dict], str]]]] = [None] * len(candidates)
+    misses = []
+    
+    for i, candidate in enumerate(candidates):
+        matched[i] = _result_cache.get(_cache_key(snapshot, medication_history, candidate, n_results))
+        if matched[i] is None:
+            misses.append(i)
+    
+    if misses:
+        # Resolve every missed candidate x current-medication pair together
+        pairs = [(current_med, candidates[i]) for i in misses for current_med in medication_history]
+        resolved = resolve_pairs(pairs, n_results, snapshot)
         
-        # Check if we found a relevant interaction
-        if results['metadatas'] and len(results['metadatas'][0]) > 0:
-            metadata = results['metadatas'][0][0]
-            
-            # Check if the interaction matches (either direction)
-            interaction_parts = metadata['interaction'].lower().split(' + ')
-            current_lower = current_med.lower()
-            new_lower = new_medicine.lower()
-            
-            if (current_lower in interaction_parts[0] and new_lower in interaction_parts[1]) or \
-               (new_lower in interaction_parts[0] and current_lower in interaction_parts[1]):
-                interactions_found.append(metadata)
+        width = len(medication_history)
+        for row, i in enumerate(misses):
+            matched[i] = {
+                normalize_drug_name(current_med): rules_and_path
+                for (current_med, _), rules_and_path in zip(
+                    pairs[row * width:(row + 1) * width], resolved[row * width:(row + 1) * width]
+                )
+            }
+            _result_cache.put(_cache_key(snapshot, medication_history, candidates[i], n_results), matched[i])
+    
+    analyzed = []
+    missed = set(misses)
+    for i, candidate in enumerate(candidates):
+        row_pairs = [(current_med, candidate) for current_med in medication_history]
+        row_resolved = [matched[i][normalize_drug_name(current_med)] for current_med in medication_history]
+        
+        # Rules naming three or more drugs come from the index's multi-drug matching only
+        multi_drug = [
+            (rule, medications) for rule, medications in snapshot.index.match(medication_history, candidate)
+            if len(medications) > 2
+        ]
+        result = _build_result(candidate, row_pairs, row_resolved, multi_drug)
+        result["rule_set_version"] = snapshot.version
+        result["cached"] = i not in missed
+        cells = {
+            normalize_drug_name(current_med): _matrix_cell(rules, path)
+            for current_med, (rules, path) in zip(medication_history, row_resolved)
+        }
+        analyzed.append((result, cells))
+    
+    return analyzed
+
+def _matrix_cell(rules: List[Dict], path: str) -> Dict:
+    """Summarize one candidate x current-medication pair for the matrix"""
+    if not rules:
+        return {"status": "Safe", "path": path}
+    
+    rule = _most_severe(rules)
+    return {
+        "status": "Risky",
+        "risk_level": rule['risk_level'],
+        "rule_id": rule['id'],
+        "path": path
+    }
+
+def _most_severe(interactions: List[Dict]) -> Dict:
+    """Pick the most severe interaction (High before Moderate before Low)"""
+    return min(interactions, key=severity_key)
+
+def _build_result(new_medicine: str, pairs: List[Tuple[str, str]],
+                  resolved: List[Tuple[List[Dict], str]],
+                  multi_drug: List[Tuple[Dict, List[str]]] = ()) -> Dict:
+    """
+    Turn resolved pairs (and any matched 3+ drug rules) into the analysis
+    response for one new medicine
+    """
+    # rule id -> (rule, medications that triggered it, path)
+    found: Dict[str, Tuple[Dict, List[str], str]] = {}
+    match_paths = []
+    
+    for (current_med, _), (rules, path) in zip(pairs, resolved):
+        for rule in rules:
+            found.setdefault(rule['id'], (rule, [current_med, new_medicine], path))
+        match_paths.append({
+            "drugs": f"{current_med} + {new_medicine}",
+            "path": path,
+            "matched": bool(rules)
+        })
+    
+    for rule, medications in multi_drug:
+        found.setdefault(rule['id'], (rule, medications, PATH_INDEX))
+        match_paths.append({
+            "drugs": " + ".join(medications),
+            "path": PATH_INDEX,
+            "matched": True
+        })
     
     # Determine overall risk status
-    if not interactions_found:
+    if not found:
         return {
             "status": "Safe",
             "patient_explanation": f"{new_medicine} appears to be safe to take with your current medications. No known interactions were found.",
             "doctor_explanation": f"No significant drug-drug interactions detected between {new_medicine} and current medication regimen based on available guidelines.",
             "source": "PrismCare AI Analysis - Medical Guidelines Database 2025",
             "confidence": 0.85,
-            "interactions": []
+            "interactions": [],
+            "match_paths": match_paths
         }
     
-    # If interactions found, return the most severe one
-    high_risk = [i for i in interactions_found if i['risk_level'] == 'High']
-    interaction = high_risk[0] if high_risk else interactions_found[0]
+    # Every interaction, most severe first; the top one explains the result
+    ranked = sorted(found.values(), key=lambda item: severity_key(item[0]))
+    interaction = ranked[0][0]
     
     return {
         "status": "Risky",
@@ -148,22 +613,82 @@ def analyze_prescription(medication_history: List[str], new_medicine: str) -> Di
         "confidence": 0.92,
         "interactions": [
             {
-                "drugs": interaction['interaction'],
-                "severity": interaction['risk_level']
+                "rule_id": rule['id'],
+                "drugs": rule['interaction'],
+                "severity": rule['risk_level'],
+                "medications": medications,
+                "path": path
             }
-        ]
+            for rule, medications, path in ranked
+        ],
+        "match_paths": match_paths
     }
 
 def get_all_rules() -> List[Dict]:
     """Get all loaded medical rules (for admin/debugging)"""
-    if collection.count() == 0:
-        load_medical_rules()
+    return list(SNAPSHOT.index.rules)
+
+def get_cache_stats() -> Dict:
+    """Result cache counters (for admin monitoring)"""
+    return dict(_result_cache.stats(), rule_set_version=SNAPSHOT.version)
+
+def get_rule_set_version() -> Optional[str]:
+    """Version stamp of the rule set the engine is serving"""
+    return SNAPSHOT.version
+
+def get_rule_set_info() -> Dict:
+    """The rule set being served (for admin monitoring)"""
+    snapshot = SNAPSHOT
+    return {
+        "rule_set_version": snapshot.version,
+        "rules": len(snapshot),
+        "pairs": len(snapshot.index),
+        "drugs": len(snapshot.index.normalizer),
+        "loaded_at": snapshot.loaded_at
+    }
+
+def warm_up():
+    """Load the embedding model now instead of on the first vector fallback"""
+    with startup_phase("embedding_model"), STAGE_SECONDS.time(stage="embedding"):
+        embedding_fn(["warm-up"])
+
+def after_fork():
+    """
+    Reopen per-process resources in a forked worker
     
-    results = collection.get()
-    return results['metadatas'] if results['metadatas'] else []
+    The rule snapshot (metadata, rule index, normalizer) stays shared with
+    the parent (copy-on-write); the Chroma client (SQLite handles) and the
+    ONNX embedding session are not fork-safe, so each worker opens its own
+    (and loads the model right away, as LazyEngine does in the parent).
+    """
+    global chroma_client, embedding_fn, SNAPSHOT
+    
+    SharedSystemClient.clear_system_cache()
+    chroma_client = chromadb.PersistentClient(path=RULE_STORE_PATH)
+    embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+    SNAPSHOT = SNAPSHOT.with_collection(
+        open_rule_collection(chroma_client, embedding_fn), client_system(chroma_client)
+    )
+    warm_up()
 
 # Initialize on import
-load_medical_rules()
+with startup_phase("rule_snapshot"):
+    _BUILT_ON_IMPORT = load_medical_rules()
+
+if __name__ == '__main__' and '--build-store' in sys.argv:
+    # Build step: embed the rules once so workers only reopen the store
+    if not _BUILT_ON_IMPORT:
+        stored_source = (SNAPSHOT.collection.metadata or {}).get("rule_source", "builtin")
+        if stored_source != "builtin" and '--force' not in sys.argv:
+            # Don't silently replace rules loaded with ingest_rules.py
+            print(f"ℹ️  Rule store holds ingested rules ({stored_source}), leaving it as is; "
+                  f"pass --force to replace them with the built-in rules")
+        else:
+            with store_lock():
+                build_rule_store()
+            load_medical_rules()
+    print(f"📦 Rule store ready at {RULE_STORE_PATH} (version {SNAPSHOT.version})")
+    sys.exit(0)
 
 if __name__ == '__main__':
     # Test the AI engine
@@ -176,6 +701,7 @@ if __name__ == '__main__':
     result1 = analyze_prescription(["Warfarin"], "Aspirin")
     print(f"Status: {result1['status']}")
     print(f"Patient: {result1['patient_explanation'][:100]}...")
+    print(f"Paths: {[p['path'] for p in result1['match_paths']]}")
     
     # Test case 2: Safe combination
     print("\n📋 Test 2: Metformin + Lisinopril")
@@ -185,5 +711,5 @@ if __name__ == '__main__':
     
     print("\n" + "=" * 60)
     print(f"✅ AI Engine working correctly!")
-    print(f"📊 Total rules loaded: {collection.count()}")
+    print(f"📊 Total rules loaded: {len(SNAPSHOT)} (version {SNAPSHOT.version})")
     print("=" * 60)
@@ -4,53 +4,293 @@ Orchestrates backend services and provides REST API for frontend
 Port: 5000
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
-import requests
+from collections import Counter
 from datetime import datetime
-import json
 import os
-from ai_engine import analyze_prescription
+import time
+from lazy_engine import LazyEngine, EngineNotReady
+from stats_store import StatsStore
+from rolling_stats import RollingStats
+from rule_reloader import RuleReloader
+from profiling import RequestProfiler, startup_phases
+from override_journal import OverrideJournal, FILTER_FIELDS
+from abdm_client import ABDMClient, PatientNotFound, ABDMUnavailable, ABDMTimeout
+from result_cache import StaleWhileRevalidateCache
+import metrics
+from metrics import STAGE_SECONDS, HTTP_REQUEST_SECONDS, ERRORS_TOTAL
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
 # Configuration
-ABDM_SERVER_URL = "http://localhost:8080"
-OVERRIDES_FILE = "overrides.json"
-STATS_FILE = "stats.json"
-
-# Initialize stats file
-if not os.path.exists(STATS_FILE):
-    with open(STATS_FILE, 'w') as f:
-        json.dump({
-            "total_validations": 0,
-            "risky_detections": 0,
-            "safe_validations": 0,
-            "total_overrides": 0
-        }, f)
-
-# Initialize overrides file
-if not os.path.exists(OVERRIDES_FILE):
-    with open(OVERRIDES_FILE, 'w') as f:
-        json.dump([], f)
-
-def update_stats(is_risky: bool, is_override: bool = False):
-    """Update statistics"""
-    with open(STATS_FILE, 'r') as f:
-        stats = json.load(f)
+API_PORT = int(os.environ.get("PRISMCARE_PORT", "5000"))
+API_DEBUG = os.environ.get("PRISMCARE_DEBUG", "1") == "1"
+ABDM_SERVER_URL = os.environ.get("PRISMCARE_ABDM_URL", "http://localhost:8080")
+ABDM_POOL_SIZE = int(os.environ.get("PRISMCARE_ABDM_POOL_SIZE", "20"))
+ABDM_LOGIN_DEADLINE = float(os.environ.get("PRISMCARE_ABDM_DEADLINE", "5.0"))
+# Patient/$everything: one round trip per login instead of Patient + MedicationRequest
+ABDM_USE_EVERYTHING = os.environ.get("PRISMCARE_ABDM_EVERYTHING", "1") == "1"
+MAX_BATCH_PATIENTS = 200
+OVERRIDES_FILE = "overrides.json"  # legacy; imported into the override journal once
+STATS_FILE = "stats.json"  # legacy; imported into the stats database once
+DB_FILE = os.environ.get("PRISMCARE_DB", "prismcare.db")
+MAX_OVERRIDES_PAGE = 500
+STATS_FLUSH_INTERVAL = float(os.environ.get("PRISMCARE_STATS_FLUSH_INTERVAL", "1.0"))
+# Rolling windows for the dashboard: per-minute buckets for this long, then per-hour
+STATS_WINDOW_MINUTES = int(os.environ.get("PRISMCARE_STATS_WINDOW_MINUTES", "120"))
+STATS_WINDOW_HOURS = int(os.environ.get("PRISMCARE_STATS_WINDOW_HOURS", "168"))
+DASHBOARD_WINDOWS = {"15m": 15 * 60, "1h": 3600, "24h": 24 * 3600}
+RECENT_OVERRIDES = 10
+PATIENT_CACHE_SIZE = int(os.environ.get("PRISMCARE_PATIENT_CACHE_SIZE", "2048"))
+PATIENT_CACHE_TTL = float(os.environ.get("PRISMCARE_PATIENT_CACHE_TTL", "30"))
+PATIENT_CACHE_STALE_TTL = float(os.environ.get("PRISMCARE_PATIENT_CACHE_STALE_TTL", "300"))
+# "background": warm the AI engine up at startup; "lazy": on the first validation
+ENGINE_WARMUP = os.environ.get("PRISMCARE_ENGINE_WARMUP", "background")
+# How long a validation arriving during warm-up waits before getting a 503
+ENGINE_WAIT_SECONDS = float(os.environ.get("PRISMCARE_ENGINE_WAIT", "10"))
+# Seconds between checks of the rule store for a new rule set (0 disables)
+RULE_RELOAD_INTERVAL = float(os.environ.get("PRISMCARE_RULE_RELOAD_INTERVAL", "30"))
+# Sampled request profiling (off unless a rate or a trigger header is set)
+PROFILE_RATE = float(os.environ.get("PRISMCARE_PROFILE_RATE", "0"))
+PROFILE_HEADER = os.environ.get("PRISMCARE_PROFILE_HEADER", "")
+PROFILE_DIR = os.environ.get("PRISMCARE_PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.environ.get("PRISMCARE_PROFILE_KEEP", "50"))
+# Shared by every worker under serve.py so /metrics reports all of them
+METRICS_DIR = os.environ.get("PRISMCARE_METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("PRISMCARE_METRICS_FLUSH_INTERVAL", "5"))
+
+# AI engine (Chroma client, embedding model, rule index) loads off the request
+# path so the port binds immediately and non-engine endpoints serve right away
+engine = LazyEngine("ai_engine")
+# With debug on, Werkzeug's reloader runs this script twice: a watcher
+# process that never serves, and the serving child (WERKZEUG_RUN_MAIN=true).
+# Only the child loads the engine, so the two don't race on the rule store.
+RELOADER_WATCHER = API_DEBUG and __name__ == '__main__' and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+if ENGINE_WARMUP == "background" and not RELOADER_WATCHER:
+    engine.start()
+
+# Swaps in a new rule snapshot on /api/admin/rules/reload or when the store changes
+rule_reloader = RuleReloader(engine, interval=RULE_RELOAD_INTERVAL)
+rule_reloader.start()
+
+# Shared ABDM client (keep-alive pool, concurrent fetches per login)
+abdm_client = ABDMClient(ABDM_SERVER_URL, pool_size=ABDM_POOL_SIZE, deadline=ABDM_LOGIN_DEADLINE)
+
+def fetch_patient(abha_id: str, etag=None):
+    """Fetch (or conditionally revalidate) one patient record from ABDM"""
+    if ABDM_USE_EVERYTHING:
+        return abdm_client.fetch_everything(abha_id, etag=etag)
+    return abdm_client.fetch_patient_record(abha_id, etags=etag)
+
+# Parsed patient records: fresh for the TTL, then served stale while an
+# ETag revalidation (usually a 304) runs in the background
+patient_cache = StaleWhileRevalidateCache(
+    loader=fetch_patient,
+    maxsize=PATIENT_CACHE_SIZE,
+    ttl=PATIENT_CACHE_TTL,
+    stale_ttl=PATIENT_CACHE_STALE_TTL
+)
+
+# Initialize stats store (in-memory counters, flushed to SQLite in the background)
+stats_store = StatsStore(DB_FILE, flush_interval=STATS_FLUSH_INTERVAL, legacy_json=STATS_FILE)
+stats_store.start()
+
+# Initialize override journal (append-only, group-committed)
+override_journal = OverrideJournal(DB_FILE, legacy_json=OVERRIDES_FILE)
+override_journal.start()
+
+# Rolling per-minute/per-hour counts, in the stats database so every worker
+# under serve.py adds to (and reads) the same windows
+rolling_stats = RollingStats(stats_store, minutes=STATS_WINDOW_MINUTES, hours=STATS_WINDOW_HOURS)
+
+# Under serve.py each worker writes its metrics to METRICS_DIR and whichever
+# worker serves /metrics merges them; otherwise /metrics is this process only
+metrics_collector = metrics.enable_multiprocess(METRICS_DIR, METRICS_FLUSH_INTERVAL) if METRICS_DIR else None
+STARTED_AT = time.time()
+
+def close_services():
+    """
+    Flush and close SQLite connections and stop background writers
     
-    stats['total_validations'] += 1
-    if is_risky:
-        stats['risky_detections'] += 1
-    else:
-        stats['safe_validations'] += 1
+    Called in the preloading parent before it forks workers (connections and
+    threads must not cross fork) and in each worker as it exits.
+    """
+    stats_store.close()
+    override_journal.close()
+    rule_reloader.close()
+    if metrics_collector:
+        metrics_collector.close()
+
+def reopen_services():
+    """Per-worker setup after fork: fresh connections, writer threads and Chroma client"""
+    stats_store.reopen()
+    override_journal.reopen()
+    loaded = engine.peek()
+    if loaded:
+        loaded.after_fork()
+    rule_reloader.reopen()
+    if metrics_collector:
+        metrics_collector.reopen()
+
+def update_stats(is_risky: bool, is_override: bool = False, risk_level: str = None):
+    """Update statistics"""
+    levels = {risk_level: 1} if is_risky and risk_level else {}
+    update_stats_batch(
+        risky=1 if is_risky else 0,
+        safe=0 if is_risky else 1,
+        overrides=1 if is_override else 0,
+        risky_by_level=levels,
+        overrides_by_level=levels if is_override else None
+    )
+
+def update_stats_batch(risky: int, safe: int, overrides: int = 0,
+                       risky_by_level: dict = None, overrides_by_level: dict = None):
+    """Update statistics for several validations in one atomic increment"""
+    with STAGE_SECONDS.time(stage="update_stats"):
+        stats_store.increment(
+            total_validations=risky + safe,
+            risky_detections=risky,
+            safe_validations=safe,
+            total_overrides=overrides
+        )
+        rolling_stats.record(
+            risky=risky,
+            safe=safe,
+            overrides=overrides,
+            risky_by_level=risky_by_level,
+            overrides_by_level=overrides_by_level
+        )
+
+def format_uptime(seconds: float) -> str:
+    """Human-readable uptime, e.g. "2d 3h 14m" """
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h {minutes}m"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+def parse_window(value: str) -> int:
+    """Window length in seconds from "90s", "15m", "6h" or "7d" """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if not value or value[-1] not in units or not value[:-1].isdigit() or int(value[:-1]) <= 0:
+        raise ValueError(f"bad window {value!r} (expected e.g. 15m, 6h, 7d)")
+    return int(value[:-1]) * units[value[-1]]
+
+def parse_page_size(name: str, default: int) -> int:
+    """A page-size query parameter, required to be within 1..MAX_OVERRIDES_PAGE"""
+    value = int(request.args.get(name, default))
+    if not 1 <= value <= MAX_OVERRIDES_PAGE:
+        raise ValueError(f"{name} must be between 1 and {MAX_OVERRIDES_PAGE}")
+    return value
+
+def parse_timestamp(name: str):
+    """
+    An ISO 8601 query parameter in the journal's timestamp format, or None
+
+    Override timestamps are local naive datetime.now().isoformat() strings
+    compared as text, so any accepted spelling ("2026-10-18 10:00",
+    "20261018T100000", "...+05:30") is rewritten into that form; aware
+    values are converted to local time first.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+def engine_not_ready(error: EngineNotReady):
+    """503 for engine-backed endpoints while the engine is unavailable"""
+    response = jsonify({
+        "error": str(error),
+        "engine": engine.status()
+    })
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def _result_cache_stats():
+    """Result cache counters, or None until the engine has loaded"""
+    loaded = engine.peek()
+    return loaded.get_cache_stats() if loaded else None
+
+def _cache_events():
+    """Cache counters for /metrics, read at scrape time"""
+    samples = {}
+    for cache, stats in (("result", _result_cache_stats() or {}), ("patient", patient_cache.stats())):
+        for event in ("hits", "stale_hits", "misses", "evictions", "not_modified"):
+            if event in stats:
+                samples[(cache, event)] = stats[event]
+    return samples
+
+metrics.CallbackMetric(
+    "prismcare_cache_events_total",
+    "Result and patient cache hits, misses and evictions",
+    "counter",
+    ("cache", "event"),
+    _cache_events
+)
+
+metrics.CallbackMetric(
+    "prismcare_engine_ready",
+    "1 once the AI engine has finished warming up",
+    "gauge",
+    (),
+    lambda: {(): 1 if engine.ready else 0}
+)
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Per-endpoint latency histogram and error counter"""
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or "unknown",
+            method=request.method,
+            status=str(response.status_code)
+        )
+    if response.status_code >= 500:
+        ERRORS_TOTAL.inc(component="api", kind=str(response.status_code))
+    return response
+
+# Hooks are only installed when profiling is on, so it costs nothing otherwise
+profiler = RequestProfiler(PROFILE_DIR, rate=PROFILE_RATE, header=PROFILE_HEADER, keep=PROFILE_KEEP)
+if profiler.enabled:
+    @app.before_request
+    def start_profile():
+        g.profile = profiler.start(request.headers)
     
-    if is_override:
-        stats['total_overrides'] += 1
+    @app.after_request
+    def write_profile(response):
+        """Save the sampled request's profile, named after its endpoint"""
+        profile = g.pop('profile', None)
+        if profile is not None:
+            path = profiler.finish(
+                profile,
+                endpoint=request.endpoint or "unknown",
+                method=request.method,
+                status=response.status_code,
+                seconds=time.perf_counter() - g.request_started
+            )
+            response.headers['X-PrismCare-Profile-File'] = os.path.basename(path)
+        return response
     
-    with open(STATS_FILE, 'w') as f:
-        json.dump(stats, f, indent=2)
+    @app.teardown_request
+    def drop_profile(error=None):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.abandon(profile)
 
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -67,58 +307,86 @@ def login():
         }), 400
     
     try:
-        # Query mock ABDM server for patient details
-        patient_response = requests.get(
-            f"{ABDM_SERVER_URL}/fhir/Patient",
-            params={"identifier": abha_id},
-            timeout=5
-        )
-        
-        if patient_response.status_code == 404:
-            return jsonify({
-                "error": "Patient not found",
-                "abha_id": abha_id
-            }), 404
+        # Cached record, or a single $everything round trip to ABDM
+        patient = patient_cache.get(abha_id)
         
-        patient_response.raise_for_status()
-        patient_data = patient_response.json()
+        return jsonify({
+            "success": True,
+            "patient": patient
+        }), 200
         
-        # Get medication history
-        med_response = requests.get(
-            f"{ABDM_SERVER_URL}/fhir/MedicationRequest",
-            params={"patient": abha_id},
-            timeout=5
-        )
-        med_response.raise_for_status()
-        med_data = med_response.json()
+    except PatientNotFound:
+        return jsonify({
+            "error": "Patient not found",
+            "abha_id": abha_id
+        }), 404
+    except ABDMUnavailable:
+        return jsonify({
+            "error": "Cannot connect to ABDM server. Please ensure mock_abdm_server.py is running on port 8080."
+        }), 503
+    except ABDMTimeout:
+        return jsonify({
+            "error": f"ABDM server did not respond within {ABDM_LOGIN_DEADLINE}s"
+        }), 504
+    except Exception as e:
+        return jsonify({
+            "error": f"Failed to fetch patient data: {str(e)}"
+        }), 500
+
+@app.route('/api/patients/batch', methods=['POST'])
+def get_patients_batch():
+    """
+    Load many patients at once (e.g. to screen a ward)
+    Cache misses are fetched from ABDM with one FHIR batch Bundle
+    """
+    data = request.get_json()
+    abha_ids = data.get('abha_ids')
+    
+    if not abha_ids or not isinstance(abha_ids, list):
+        return jsonify({
+            "error": "abha_ids must be a non-empty list"
+        }), 400
+    if len(abha_ids) > MAX_BATCH_PATIENTS:
+        return jsonify({
+            "error": f"At most {MAX_BATCH_PATIENTS} patients per batch"
+        }), 400
+    
+    try:
+        patients = {}
+        misses = []
+        for abha_id in dict.fromkeys(abha_ids):
+            cached = patient_cache.get_if_present(abha_id)
+            if cached is not None:
+                patients[abha_id] = cached
+            else:
+                misses.append(abha_id)
         
-        # Extract medication list
-        medications = []
-        if med_data.get('entry'):
-            for entry in med_data['entry']:
-                resource = entry['resource']
-                medications.append({
-                    "name": resource['medicationCodeableConcept']['text'],
-                    "dosage": resource['dosageInstruction'][0]['text'],
-                    "status": resource['status'],
-                    "start_date": resource['authoredOn']
-                })
+        if misses and ABDM_USE_EVERYTHING:
+            for abha_id, (record, etag) in abdm_client.fetch_everything_batch(misses).items():
+                if record is not None:
+                    patient_cache.put(abha_id, record, etag)
+                    patients[abha_id] = record
+        else:
+            for abha_id in misses:
+                try:
+                    patients[abha_id] = patient_cache.get(abha_id)
+                except PatientNotFound:
+                    pass
         
         return jsonify({
             "success": True,
-            "patient": {
-                "abha_id": patient_data['id'],
-                "name": patient_data['name'][0]['text'],
-                "age": patient_data.get('age'),
-                "gender": patient_data['gender'],
-                "medications": medications
-            }
+            "patients": [patients[a] for a in dict.fromkeys(abha_ids) if a in patients],
+            "not_found": [a for a in dict.fromkeys(abha_ids) if a not in patients]
         }), 200
         
-    except requests.exceptions.ConnectionError:
+    except ABDMUnavailable:
         return jsonify({
             "error": "Cannot connect to ABDM server. Please ensure mock_abdm_server.py is running on port 8080."
         }), 503
+    except ABDMTimeout:
+        return jsonify({
+            "error": f"ABDM server did not respond within {ABDM_LOGIN_DEADLINE}s"
+        }), 504
     except Exception as e:
         return jsonify({
             "error": f"Failed to fetch patient data: {str(e)}"
@@ -140,26 +408,79 @@ def validate_prescription():
             "error": "new_medicine is required"
         }), 400
     
+    try:
+        ai_engine = engine.get(timeout=ENGINE_WAIT_SECONDS)
+    except EngineNotReady as e:
+        return engine_not_ready(e)
+    
     try:
         # Call AI engine
-        result = analyze_prescription(medication_history, new_medicine)
+        result = ai_engine.analyze_prescription(medication_history, new_medicine)
         
         # Update statistics
         is_risky = result['status'] == 'Risky'
-        update_stats(is_risky)
+        update_stats(is_risky, risk_level=result.get('risk_level'))
         
         # Add timestamp
         result['timestamp'] = datetime.now().isoformat()
         result['medicine_checked'] = new_medicine
         result['current_medications'] = medication_history
         
-        return jsonify(result), 200
+        with STAGE_SECONDS.time(stage="json_serialize"):
+            response = jsonify(result)
+        return response, 200
         
     except Exception as e:
         return jsonify({
             "error": f"Analysis failed: {str(e)}"
         }), 500
 
+@app.route('/api/validate/batch', methods=['POST'])
+def validate_batch():
+    """
+    Validate several candidate medicines against one medication history
+    Returns the candidate x current-medication interaction matrix
+    """
+    data = request.get_json()
+    
+    medication_history = data.get('history', [])
+    candidates = data.get('candidates')
+    
+    if not candidates or not isinstance(candidates, list):
+        return jsonify({
+            "error": "candidates must be a non-empty list"
+        }), 400
+    
+    try:
+        ai_engine = engine.get(timeout=ENGINE_WAIT_SECONDS)
+    except EngineNotReady as e:
+        return engine_not_ready(e)
+    
+    try:
+        # One engine pass for every candidate
+        batch = ai_engine.analyze_batch(medication_history, candidates)
+        
+        # One stats update for the whole batch
+        risky_by_level = Counter(r['risk_level'] for r in batch['results'] if r['status'] == 'Risky')
+        risky = sum(risky_by_level.values())
+        update_stats_batch(risky=risky, safe=len(candidates) - risky, risky_by_level=risky_by_level)
+        
+        timestamp = datetime.now().isoformat()
+        for candidate, result in zip(candidates, batch['results']):
+            result['timestamp'] = timestamp
+            result['medicine_checked'] = candidate
+            result['current_medications'] = medication_history
+        
+        batch['timestamp'] = timestamp
+        with STAGE_SECONDS.time(stage="json_serialize"):
+            response = jsonify(batch)
+        return response, 200
+        
+    except Exception as e:
+        return jsonify({
+            "error": f"Batch analysis failed: {str(e)}"
+        }), 500
+
 @app.route('/api/admin/override', methods=['POST'])
 def log_override():
     """
@@ -174,13 +495,8 @@ def log_override():
         }), 400
     
     try:
-        # Load existing overrides
-        with open(OVERRIDES_FILE, 'r') as f:
-            overrides = json.load(f)
-        
-        # Add new override
+        # Add new override (id is allocated by the journal)
         override_entry = {
-            "id": len(overrides) + 1,
             "timestamp": datetime.now().isoformat(),
             "doctor_id": data['doctor_id'],
             "doctor_name": data.get('doctor_name', 'Unknown'),
@@ -191,14 +507,10 @@ def log_override():
             "status": "Pending Review"
         }
         
-        overrides.append(override_entry)
-        
-        # Save to file
-        with open(OVERRIDES_FILE, 'w') as f:
-            json.dump(overrides, f, indent=2)
+        override_entry = override_journal.append(override_entry)
         
         # Update stats
-        update_stats(is_risky=True, is_override=True)
+        update_stats(is_risky=True, is_override=True, risk_level=override_entry['risk_level'])
         
         return jsonify({
             "success": True,
@@ -215,15 +527,21 @@ def log_override():
 def get_stats():
     """
     Get system statistics for admin dashboard
+    Lifetime totals plus rolling windows (15m/1h/24h, or ?window=30m&window=7d)
     """
+    try:
+        windows = {
+            label: parse_window(label) for label in request.args.getlist('window')
+        } or DASHBOARD_WINDOWS
+    except ValueError as e:
+        return jsonify({
+            "error": f"Invalid query: {str(e)}"
+        }), 400
+    
     try:
         # Load stats
-        with open(STATS_FILE, 'r') as f:
-            stats = json.load(f)
-        
-        # Load overrides
-        with open(OVERRIDES_FILE, 'r') as f:
-            overrides = json.load(f)
+        stats = stats_store.snapshot()
+        uptime = time.time() - STARTED_AT
         
         # Calculate additional metrics
         total = stats['total_validations']
@@ -237,8 +555,11 @@ def get_stats():
             "total_overrides": stats['total_overrides'],
             "risk_percentage": round(risk_percentage, 2),
             "override_rate": round(override_rate, 2),
-            "recent_overrides": overrides[-10:] if len(overrides) > 10 else overrides,
-            "system_uptime": "99.9%",
+            "windows": {label: rolling_stats.window(seconds) for label, seconds in windows.items()},
+            "recent_overrides": override_journal.tail(RECENT_OVERRIDES),
+            "system_uptime": format_uptime(uptime),
+            "uptime_seconds": round(uptime),
+            "started_at": datetime.fromtimestamp(STARTED_AT).isoformat(),
             "last_updated": datetime.now().isoformat()
         }), 200
         
@@ -247,59 +568,212 @@ def get_stats():
             "error": f"Failed to fetch stats: {str(e)}"
         }), 500
 
+@app.route('/api/admin/stats/timeseries', methods=['GET'])
+def get_stats_timeseries():
+    """
+    Per-minute or per-hour counts for dashboard charts
+    Query params: resolution (minute|hour), buckets
+    """
+    resolution = request.args.get('resolution', 'minute')
+    if resolution not in ('minute', 'hour'):
+        return jsonify({
+            "error": "resolution must be minute or hour"
+        }), 400
+    
+    try:
+        buckets = int(request.args.get('buckets', 60))
+    except ValueError:
+        return jsonify({
+            "error": "buckets must be an integer"
+        }), 400
+    
+    return jsonify({
+        "resolution": resolution,
+        "series": rolling_stats.series(resolution, max(1, buckets)),
+        "last_updated": datetime.now().isoformat()
+    }), 200
+
 @app.route('/api/admin/overrides', methods=['GET'])
 def get_all_overrides():
     """
     Get all override logs (with pagination)
+    
+    Filtering by doctor_id, patient_id, drug, risk_level, status or a
+    since/until time range, or passing cursor/limit, switches to keyset
+    pagination (newest first); otherwise page/per_page is used.
     """
+    filters = {field: request.args[field] for field in FILTER_FIELDS if request.args.get(field)}
+    keyset = filters or any(
+        request.args.get(arg) for arg in ('since', 'until', 'cursor', 'limit')
+    )
+    
     try:
-        with open(OVERRIDES_FILE, 'r') as f:
-            overrides = json.load(f)
+        if keyset:
+            return search_overrides(filters)
         
         # Get pagination params
         page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        if page < 1:
+            raise ValueError("page must be 1 or more")
+        per_page = parse_page_size('per_page', 10)
         
-        # Calculate pagination
-        start = (page - 1) * per_page
-        end = start + per_page
+        total = override_journal.count()
         
         return jsonify({
-            "overrides": overrides[start:end],
-            "total": len(overrides),
+            "overrides": override_journal.page(page, per_page),
+            "total": total,
             "page": page,
             "per_page": per_page,
-            "total_pages": (len(overrides) + per_page - 1) // per_page
+            "total_pages": (total + per_page - 1) // per_page
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            "error": f"Invalid query: {str(e)}"
+        }), 400
     except Exception as e:
         return jsonify({
             "error": f"Failed to fetch overrides: {str(e)}"
         }), 500
 
+def search_overrides(filters: dict):
+    """Filtered, cursor-paginated override search"""
+    since = parse_timestamp('since')
+    until = parse_timestamp('until')
+    
+    cursor = request.args.get('cursor')
+    limit = parse_page_size('limit', 50)
+    
+    overrides, next_cursor = override_journal.search(
+        filters=filters,
+        since=since,
+        until=until,
+        cursor=int(cursor) if cursor else None,
+        limit=limit
+    )
+    
+    return jsonify({
+        "overrides": overrides,
+        "filters": filters,
+        "since": since,
+        "until": until,
+        "limit": limit,
+        "next_cursor": str(next_cursor) if next_cursor is not None else None
+    }), 200
+
+@app.route('/api/admin/cache', methods=['GET'])
+def get_cache():
+    """
+    Get cache counters (hits, misses, evictions) for analysis results
+    and ABDM patient records
+    """
+    return jsonify({
+        "result_cache": _result_cache_stats() or {"engine": engine.status()},
+        "patient_cache": patient_cache.stats(),
+        "last_updated": datetime.now().isoformat()
+    }), 200
+
+@app.route('/api/admin/rules', methods=['GET'])
+def get_rules():
+    """
+    Get the rule set being served (version, size, when it was loaded)
+    and the state of the last reload
+    """
+    loaded = engine.peek()
+    return jsonify({
+        "rule_set": loaded.get_rule_set_info() if loaded else {"engine": engine.status()},
+        "reload": rule_reloader.status(),
+        "last_updated": datetime.now().isoformat()
+    }), 200
+
+@app.route('/api/admin/rules/reload', methods=['POST'])
+def reload_rules():
+    """
+    Reload the rule set from the rule store without a restart
+    Returns 202 right away, or 200 once the new rules are live with ?wait=1.
+    In-flight validations finish against the rules they started with.
+    """
+    try:
+        engine.get(timeout=ENGINE_WAIT_SECONDS)
+    except EngineNotReady as e:
+        return engine_not_ready(e)
+    
+    wait = request.args.get('wait') == '1'
+    status = rule_reloader.trigger(wait=wait)
+    if not wait:
+        return jsonify(status), 202
+    if status["state"] == "failed":
+        return jsonify(status), 500
+    return jsonify(status), 200
+
+@app.route('/api/admin/profiling', methods=['GET'])
+def get_profiling():
+    """
+    Get request profiler settings and counters, and how long this
+    process's startup steps took
+    """
+    return jsonify({
+        "request_profiler": profiler.status(),
+        "startup_phases": startup_phases(),
+        "engine": engine.status(),
+        "last_updated": datetime.now().isoformat()
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text-format metrics"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """
+    Health check endpoint
+    Always 200 while the process is up (liveness); "ready" says whether
+    the AI engine can serve validations yet
+    """
     return jsonify({
         "status": "healthy",
         "service": "PrismCare API",
+        "ready": engine.ready,
+        "engine": engine.status(),
         "timestamp": datetime.now().isoformat(),
         "abdm_server": ABDM_SERVER_URL
     }), 200
 
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the process is up and serving HTTP"""
+    return jsonify({"status": "alive"}), 200
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until the AI engine has warmed up"""
+    status = engine.status()
+    if not engine.ready:
+        return jsonify({"status": "not ready", "engine": status}), 503
+    return jsonify({"status": "ready", "engine": status}), 200
+
 if __name__ == '__main__':
     print("=" * 60)
     print("🚀 PrismCare API Server Starting...")
     print("=" * 60)
-    print(f"📍 Running on: http://localhost:5000")
+    print(f"📍 Running on: http://localhost:{API_PORT}")
     print(f"🔗 ABDM Server: {ABDM_SERVER_URL}")
     print("\n📋 Available Endpoints:")
     print("  POST /api/login")
+    print("  POST /api/patients/batch")
     print("  POST /api/validate")
+    print("  POST /api/validate/batch")
     print("  POST /api/admin/override")
     print("  GET  /api/admin/stats")
+    print("  GET  /api/admin/stats/timeseries")
     print("  GET  /api/admin/overrides")
-    print("  GET  /health")
+    print("  GET  /api/admin/cache")
+    print("  GET  /api/admin/rules")
+    print("  POST /api/admin/rules/reload")
+    print("  GET  /api/admin/profiling")
+    print("  GET  /metrics")
+    print("  GET  /health  (/health/live, /health/ready)")
     print("\n⚠️  Make sure mock_abdm_server.py is running on port 8080!")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=API_PORT, debug=API_DEBUG)
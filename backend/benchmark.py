@@ -0,0 +1,340 @@
+"""
+PrismCare Load & Latency Benchmark
+Starts the mock ABDM server and the API, drives the main endpoints with
+configurable concurrency and writes throughput / p50 / p95 / p99 results as JSON
+
+Usage:
+    python benchmark.py --requests 500 --concurrency 16 --output bench.json
+    python benchmark.py --compare bench_before.json bench.json
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEMO_IDS = ["ABHA001", "ABHA002", "ABHA003"]
+DRUGS = [
+    "Warfarin", "Aspirin", "Ibuprofen", "Metformin", "Lisinopril", "Atorvastatin",
+    "Alcohol", "Potassium Supplements", "Grapefruit Juice", "Amlodipine",
+    "Omeprazole", "Paracetamol", "Clopidogrel", "Losartan", "Potassium", "Grapefruit"
+]
+ENDPOINTS = ["login", "validate", "validate_batch", "override", "admin_stats", "admin_overrides"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> Dict:
+    """Throughput and latency percentiles (milliseconds) for one group of requests"""
+    values = sorted(latencies)
+    count = len(values) + errors
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0
+    }
+
+
+def engine_path(result: Dict) -> str:
+    """Which engine path answered a validation: cached, index, vector or empty"""
+    if result.get("cached"):
+        return "cached"
+    paths = {p["path"] for p in result.get("match_paths", [])}
+    if not paths:
+        return "empty"
+    return "vector" if "vector" in paths else "index"
+
+
+class Workload:
+    """Request generators for each benchmarked endpoint"""
+
+    def __init__(self, api_url: str, population: int, history_size: int, batch_size: int, seed: int):
+        self.api_url = api_url
+        self.population = population
+        self.history_size = history_size
+        self.batch_size = batch_size
+        self.seed = seed
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # One keep-alive session and RNG per driver thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+            self._local.rng = random.Random(f"{self.seed}-{threading.get_ident()}")
+        return self._local.session
+
+    def _abha_id(self) -> str:
+        rng = self._local.rng
+        if self.population and rng.random() < 0.9:
+            return f"SYN{rng.randrange(self.population):08d}"
+        return rng.choice(DEMO_IDS)
+
+    def _history(self) -> List[str]:
+        return self._local.rng.sample(DRUGS, self.history_size)
+
+    def request(self, endpoint: str) -> requests.Response:
+        session = self._session()
+        rng = self._local.rng
+        if endpoint == "login":
+            return session.post(f"{self.api_url}/api/login", json={"abha_id": self._abha_id()}, timeout=30)
+        if endpoint == "validate":
+            return session.post(f"{self.api_url}/api/validate", json={
+                "history": self._history(), "new_medicine": rng.choice(DRUGS)
+            }, timeout=30)
+        if endpoint == "validate_batch":
+            return session.post(f"{self.api_url}/api/validate/batch", json={
+                "history": self._history(), "candidates": rng.sample(DRUGS, self.batch_size)
+            }, timeout=30)
+        if endpoint == "override":
+            return session.post(f"{self.api_url}/api/admin/override", json={
+                "doctor_id": f"DOC{rng.randrange(50):03d}",
+                "patient_id": self._abha_id(),
+                "drug": rng.choice(DRUGS),
+                "risk_level": rng.choice(["High", "Moderate"]),
+                "reason": "Benchmark override"
+            }, timeout=30)
+        if endpoint == "admin_stats":
+            return session.get(f"{self.api_url}/api/admin/stats", timeout=30)
+        if endpoint == "admin_overrides":
+            return session.get(f"{self.api_url}/api/admin/overrides",
+                               params={"page": rng.randint(1, 20), "per_page": 10}, timeout=30)
+        raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def run_endpoint(workload: Workload, endpoint: str, total: int, concurrency: int) -> Dict:
+    """Fire total requests at one endpoint from concurrency threads"""
+    latencies: List[float] = []
+    by_path: Dict[str, List[float]] = {}
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            response = workload.request(endpoint)
+            elapsed = time.perf_counter() - started
+            ok = response.status_code < 400 or (endpoint == "login" and response.status_code == 404)
+        except requests.RequestException:
+            elapsed, ok, response = time.perf_counter() - started, False, None
+
+        with lock:
+            if not ok:
+                errors += 1
+                return
+            latencies.append(elapsed)
+            if endpoint == "validate":
+                by_path.setdefault(engine_path(response.json()), []).append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    summary = summarize(latencies, errors, wall)
+    if by_path:
+        summary["by_engine_path"] = {
+            path: summarize(values, 0, wall) for path, values in sorted(by_path.items())
+        }
+    return summary
+
+
+def wait_healthy(url: str, process: Optional[subprocess.Popen], timeout: float,
+                 path: str = "/health"):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            if requests.get(f"{url}{path}", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+
+
+def start_servers(args, workdir: str) -> List[subprocess.Popen]:
+    """Start the mock ABDM server and the API as subprocesses"""
+    log = open(os.path.join(workdir, "servers.log"), "w")
+    abdm = subprocess.Popen(
+        [sys.executable, "mock_abdm_server.py", "--port", str(args.abdm_port), "--no-debug",
+         "--population", str(args.population), "--seed", str(args.seed),
+         "--latency-ms", str(args.abdm_latency_ms), "--jitter-ms", str(args.abdm_jitter_ms)],
+        cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT
+    )
+    env = dict(
+        os.environ,
+        PRISMCARE_PORT=str(args.api_port),
+        PRISMCARE_DEBUG="0",
+        PRISMCARE_ABDM_URL=f"http://localhost:{args.abdm_port}",
+        PRISMCARE_DB=os.path.join(workdir, "prismcare.db")
+    )
+    # --workers N benchmarks the multi-process gunicorn entry point instead
+    # of the single-process development server
+    command = [sys.executable, "app.py"]
+    if args.workers:
+        command = [sys.executable, "serve.py", "--port", str(args.api_port), "--workers", str(args.workers)]
+    api = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    processes = [abdm, api]
+    try:
+        wait_healthy(f"http://localhost:{args.abdm_port}", abdm, args.startup_timeout)
+        # Measure steady state: wait for the AI engine to finish warming up
+        wait_healthy(f"http://localhost:{args.api_port}", api, args.startup_timeout, "/health/ready")
+    except Exception:
+        stop_servers(processes)
+        raise
+    return processes
+
+
+def stop_servers(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="prismcare-bench-")
+    api_url = args.api_url or f"http://localhost:{args.api_port}"
+    processes = [] if args.api_url else start_servers(args, workdir)
+
+    try:
+        workload = Workload(api_url, args.population, args.history_size, args.batch_size, args.seed)
+        # Warm-up pass so the first measured requests don't pay for lazy initialization
+        for endpoint in args.endpoints:
+            run_endpoint(workload, endpoint, min(args.warmup, args.requests), args.concurrency)
+
+        results = {}
+        for endpoint in args.endpoints:
+            results[endpoint] = run_endpoint(workload, endpoint, args.requests, args.concurrency)
+            print_summary(endpoint, results[endpoint])
+    finally:
+        stop_servers(processes)
+
+    return {
+        "benchmark": "prismcare-api",
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "population": args.population,
+            "history_size": args.history_size,
+            "batch_size": args.batch_size,
+            "abdm_latency_ms": args.abdm_latency_ms,
+            "abdm_jitter_ms": args.abdm_jitter_ms,
+            "seed": args.seed,
+            "workers": args.workers,
+            "cpu_count": os.cpu_count()
+        },
+        "endpoints": results,
+        "server_log": None if args.api_url else os.path.join(workdir, "servers.log")
+    }
+
+
+def print_summary(name: str, summary: Dict, indent: str = ""):
+    print(f"{indent}{name:<18} {summary['requests']:>7} req  {summary['errors']:>5} err  "
+          f"{summary['throughput_rps']:>9.1f} rps  p50 {summary['p50_ms']:>8.2f}ms  "
+          f"p95 {summary['p95_ms']:>8.2f}ms  p99 {summary['p99_ms']:>8.2f}ms")
+    for path, path_summary in summary.get("by_engine_path", {}).items():
+        print_summary(f"[{path}]", path_summary, indent + "  ")
+
+
+def compare(before_path: str, after_path: str):
+    """Print per-endpoint deltas between two result files"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{(before.get('git_commit') or '?')[:10]} -> {(after.get('git_commit') or '?')[:10]}")
+    for endpoint, new in after["endpoints"].items():
+        old = before["endpoints"].get(endpoint)
+        if not old:
+            continue
+        deltas = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            deltas.append(f"{key} {old[key]:.2f} -> {new[key]:.2f} ({change:+.1f}%)")
+        print(f"{endpoint:<18} " + "  ".join(deltas))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PrismCare API load and latency benchmark")
+    parser.add_argument("--requests", type=int, default=300, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint first")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--population", type=int, default=10000, help="Synthetic ABDM patients")
+    parser.add_argument("--history-size", type=int, default=4, help="Medications per validation")
+    parser.add_argument("--batch-size", type=int, default=5, help="Candidates per batch validation")
+    parser.add_argument("--abdm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--abdm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--api-port", type=int, default=5055)
+    parser.add_argument("--abdm-port", type=int, default=8089)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Serve the API with serve.py and this many worker processes")
+    parser.add_argument("--api-url", help="Benchmark an already running API instead of spawning servers")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="Compare two result files instead of running")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    print("=" * 60)
+    print("⏱️  PrismCare Benchmark")
+    print("=" * 60)
+    report = run(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
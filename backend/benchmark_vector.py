@@ -0,0 +1,175 @@
+"""
+Vector Fallback Benchmark
+Compares the Chroma (HNSW) and NumPy (in-memory matrix) vector backends as
+the rule count and the number of pairs per request grow
+
+Embeddings are synthetic (seeded random unit vectors), so this measures the
+search itself; embedding the query text costs the same on both paths.
+
+Usage:
+    python benchmark_vector.py
+    python benchmark_vector.py --rules 1000 10000 100000 --history 2 8 32 --output vector.json
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List
+import argparse
+import json
+import platform
+import time
+
+import chromadb
+import numpy as np
+
+from benchmark import percentile, git_commit
+from rule_matrix import RuleMatrix
+
+DIMENSIONS = 384  # all-MiniLM-L6-v2, Chroma's default embedding model
+ADD_BATCH_SIZE = 5000
+
+
+def synthetic_rules(count: int, rng: np.random.Generator):
+    """Unit-length rule embeddings plus minimal metadata"""
+    embeddings = rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    metadatas = [{"id": f"rule_{i:07d}", "risk_level": "Moderate"} for i in range(count)]
+    return embeddings, metadatas
+
+
+def synthetic_queries(embeddings: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Queries near random rules, like a misspelled or unlisted drug pair would be"""
+    picks = rng.integers(0, len(embeddings), count)
+    queries = embeddings[picks] + 0.3 * rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def time_requests(search: Callable[[np.ndarray], List[List[Dict]]], requests: List[np.ndarray]) -> Dict:
+    latencies = []
+    for queries in requests:
+        started = time.perf_counter()
+        search(queries)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3)
+    }
+
+
+def build_backends(rule_count: int, rng: np.random.Generator, client) -> Dict:
+    """Load the same synthetic rules into a Chroma collection and a RuleMatrix"""
+    embeddings, metadatas = synthetic_rules(rule_count, rng)
+
+    started = time.perf_counter()
+    try:
+        client.delete_collection("bench_rules")
+    except Exception:
+        pass
+    collection = client.create_collection("bench_rules")
+    for start in range(0, rule_count, ADD_BATCH_SIZE):
+        collection.add(
+            ids=[m["id"] for m in metadatas[start:start + ADD_BATCH_SIZE]],
+            embeddings=embeddings[start:start + ADD_BATCH_SIZE].tolist(),
+            metadatas=metadatas[start:start + ADD_BATCH_SIZE]
+        )
+    chroma_build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matrix = RuleMatrix.from_collection(collection)
+    matrix_build = time.perf_counter() - started
+
+    return {
+        "embeddings": embeddings,
+        "collection": collection,
+        "matrix": matrix,
+        "build_seconds": {"chroma": round(chroma_build, 3), "numpy": round(matrix_build, 3)}
+    }
+
+
+def run_case(backends: Dict, history_size: int, args, rng: np.random.Generator) -> Dict:
+    collection, matrix = backends["collection"], backends["matrix"]
+    pairs_per_request = history_size * args.candidates
+    requests = [
+        synthetic_queries(backends["embeddings"], pairs_per_request, rng) for _ in range(args.repeat)
+    ]
+    k = args.n_results
+
+    def chroma_batched(queries):
+        return collection.query(query_embeddings=queries.tolist(), n_results=k)["metadatas"]
+
+    def chroma_per_pair(queries):
+        return [collection.query(query_embeddings=[q.tolist()], n_results=k)["metadatas"][0] for q in queries]
+
+    def numpy_matrix(queries):
+        return matrix.top_k(queries, k)
+
+    # Agreement of the top hit (HNSW is approximate, the matrix is exact)
+    agree = total = 0
+    for queries in requests[:10]:
+        for a, b in zip(chroma_batched(queries), numpy_matrix(queries)):
+            agree += a[0]["id"] == b[0]["id"]
+            total += 1
+
+    result = {
+        "rules": len(matrix),
+        "history_size": history_size,
+        "pairs_per_request": pairs_per_request,
+        "build_seconds": backends["build_seconds"],
+        "matrix_mb": round(matrix.nbytes / 1e6, 1),
+        "top1_agreement": round(agree / total, 4) if total else None,
+        "chroma": time_requests(chroma_batched, requests),
+        "numpy": time_requests(numpy_matrix, requests)
+    }
+    if args.per_pair:
+        result["chroma_per_pair"] = time_requests(chroma_per_pair, requests)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chroma vs NumPy vector fallback benchmark")
+    parser.add_argument("--rules", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--history", type=int, nargs="+", default=[2, 8, 32],
+                        help="Current medications per request")
+    parser.add_argument("--candidates", type=int, default=1, help="Candidate medicines per request")
+    parser.add_argument("--n-results", type=int, default=1, help="Nearest rules per pair")
+    parser.add_argument("--repeat", type=int, default=50, help="Measured requests per case")
+    parser.add_argument("--per-pair", action="store_true", help="Also time one Chroma query per pair")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_vector.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    client = chromadb.EphemeralClient()
+
+    print("=" * 60)
+    print("🧮 Vector Backend Benchmark (p50 / p95 ms per request)")
+    print("=" * 60)
+    cases = []
+    for rule_count in args.rules:
+        rng = np.random.default_rng(args.seed)
+        backends = build_backends(rule_count, rng, client)
+        for history_size in args.history:
+            case = run_case(backends, history_size, args, rng)
+            cases.append(case)
+            line = (f"{rule_count:>8} rules  {case['pairs_per_request']:>4} pairs  "
+                    f"chroma {case['chroma']['p50_ms']:>8.3f} / {case['chroma']['p95_ms']:>8.3f}  "
+                    f"numpy {case['numpy']['p50_ms']:>8.3f} / {case['numpy']['p95_ms']:>8.3f}  "
+                    f"top-1 agree {case['top1_agreement']:.2%}")
+            if "chroma_per_pair" in case:
+                line += f"  per-pair {case['chroma_per_pair']['p50_ms']:.3f}"
+            print(line)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "started_at": datetime.now().isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "config": vars(args),
+            "cases": cases
+        }, f, indent=2)
+    print(f"\n📄 Results written to {args.output}")
@@ -0,0 +1,173 @@
+"""
+Drug Name Normalization
+Maps free-text drug names (brand, generic, salt form, with doses) to integer
+canonical drug IDs using an alias table and an Aho-Corasick automaton
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+# Canonical name -> aliases. Canonical names match the names used in rules;
+# aliases cover common Indian and US brands, generics and salt forms.
+DRUG_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "Aspirin": ("acetylsalicylic acid", "ecosprin", "disprin", "loprin", "bayer aspirin"),
+    "Warfarin": ("warfarin sodium", "coumadin", "jantoven", "uniwarfin"),
+    "Ibuprofen": ("brufen", "advil", "motrin", "ibugesic"),
+    "Metformin": ("metformin hydrochloride", "metformin hcl", "glycomet", "glucophage", "gluformin"),
+    "Alcohol": ("ethanol", "ethyl alcohol", "alcoholic beverages", "beer", "wine", "liquor"),
+    "Lisinopril": ("zestril", "prinivil", "listril", "lipril"),
+    "Potassium Supplements": ("potassium", "potassium chloride", "potassium citrate", "kcl",
+                              "k dur", "klor con"),
+    "Atorvastatin": ("atorvastatin calcium", "lipitor", "atorva", "storvas", "tonact"),
+    "Grapefruit Juice": ("grapefruit",),
+    "Clopidogrel": ("clopidogrel bisulfate", "plavix", "clopilet", "deplatt"),
+    "Paracetamol": ("acetaminophen", "crocin", "dolo", "calpol", "tylenol"),
+    "Amlodipine": ("amlodipine besylate", "norvasc", "amlong", "amlodac"),
+    "Omeprazole": ("prilosec", "omez"),
+    "Losartan": ("losartan potassium", "cozaar", "losar", "repace"),
+    "Hydrochlorothiazide": ("hctz", "aquazide", "microzide"),
+    "Levothyroxine": ("levothyroxine sodium", "thyronorm", "eltroxin", "synthroid"),
+    "Insulin Glargine": ("lantus", "basalog", "glaritus"),
+}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse punctuation/whitespace to single spaces"""
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+class DrugNormalizer:
+    """
+    Immutable name -> canonical drug ID resolver
+
+    Every alias is compiled into one Aho-Corasick automaton, so a free-text
+    name such as "Ecosprin 75mg tablet" is resolved in a single scan. Only
+    whole-word matches count, and the leftmost-longest match wins, so doses,
+    dosage forms and unlisted salt suffixes are ignored.
+    """
+
+    def __init__(self, drug_names: Iterable[str] = (),
+                 aliases: Dict[str, Tuple[str, ...]] = DRUG_ALIASES):
+        self.names: List[str] = []
+        self._alias_ids: Dict[str, int] = {}
+
+        for canonical, extra in aliases.items():
+            drug_id = self._add_canonical(canonical)
+            for alias in extra:
+                self._alias_ids.setdefault(normalize_text(alias), drug_id)
+
+        # Names from rules: reuse an existing ID when the name is a known
+        # alias or mentions one ("Aspirin (low dose)", "Ibuprofen oral"), so
+        # the rule and the alias table agree on the drug. Only names with no
+        # known drug in them become new canonical drugs.
+        self._build_automaton()
+        for name in drug_names:
+            key = normalize_text(name)
+            if key in self._alias_ids:
+                continue
+            matches = self.scan(name)
+            if matches:
+                self._alias_ids[key] = matches[0][2]
+            else:
+                self._add_canonical(name)
+
+        self._build_automaton()
+
+    def _add_canonical(self, name: str) -> int:
+        key = normalize_text(name)
+        if key in self._alias_ids:
+            return self._alias_ids[key]
+        drug_id = len(self.names)
+        self.names.append(name)
+        self._alias_ids[key] = drug_id
+        return drug_id
+
+    def _build_automaton(self):
+        # Trie as parallel lists: goto transitions, failure links, and the
+        # (length, drug ID) patterns ending at each node
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, int]]] = [[]]
+
+        for alias, drug_id in self._alias_ids.items():
+            node = 0
+            for char in alias:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(alias), drug_id))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                if node:
+                    fallback = self._fail[node]
+                    while fallback and char not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def scan(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Non-overlapping whole-word drug mentions in text
+
+        Returns:
+            (start, end, drug ID) in the normalized text, leftmost-longest first
+        """
+        normalized = normalize_text(text)
+        matches = []
+        node = 0
+        for end, char in enumerate(normalized, start=1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, drug_id in self._out[node]:
+                start = end - length
+                if (start == 0 or normalized[start - 1] == ' ') and \
+                   (end == len(normalized) or normalized[end] == ' '):
+                    matches.append((start, end, drug_id))
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        last_end = 0
+        for start, end, drug_id in matches:
+            if start >= last_end:
+                selected.append((start, end, drug_id))
+                last_end = end
+        return selected
+
+    def resolve(self, text: str) -> Optional[int]:
+        """Canonical ID of the first drug named in text, or None if none is known"""
+        drug_id = self._alias_ids.get(normalize_text(text))
+        if drug_id is not None:
+            return drug_id
+        matches = self.scan(text)
+        return matches[0][2] if matches else None
+
+    def resolve_all(self, text: str) -> List[int]:
+        """Distinct canonical IDs of every drug named in text (e.g. combination products)"""
+        drug_id = self._alias_ids.get(normalize_text(text))
+        if drug_id is not None:
+            return [drug_id]
+        ids: List[int] = []
+        for _, _, drug_id in self.scan(text):
+            if drug_id not in ids:
+                ids.append(drug_id)
+        return ids
+
+    def name(self, drug_id: int) -> str:
+        """Canonical name for an ID"""
+        return self.names[drug_id]
@@ -0,0 +1,261 @@
+"""
+Streaming Rule Ingestion
+Loads interaction rules from CSV/JSONL into the persistent rule store in
+bounded-memory chunks, re-embedding only rows whose content changed
+
+Usage:
+    python ingest_rules.py interactions.csv
+    python ingest_rules.py interactions.jsonl --workers 4 --chunk-size 1000 --prune
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+
+import chromadb
+from chromadb.utils import embedding_functions
+
+from rule_schema import (
+    RULE_STORE_PATH, CONTENT_HASH_FIELD, REQUIRED_FIELDS, OPTIONAL_FIELDS,
+    open_rule_collection, store_lock, rule_document, rule_content_hash, combine_version, validate_rule, interaction_drugs
+)
+
+# Columns accepted instead of a single "interaction" field
+DRUG_COLUMNS = ("drug_a", "drug_b", "drug_c", "drug_d")
+PAGE_SIZE = 5000
+
+_worker_embedding_fn = None
+
+
+def _init_worker():
+    """Load the embedding model once per worker process"""
+    global _worker_embedding_fn
+    _worker_embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+
+
+def _embed_in_worker(documents: List[str]) -> List[List[float]]:
+    return [list(map(float, e)) for e in _worker_embedding_fn(documents)]
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """Stream (line number, row) from a CSV or JSONL file"""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, {"_error": f"invalid JSON: {e.msg}"}
+
+
+def normalize_row(row: Dict) -> Dict:
+    """Trim fields, build the interaction from drug_* columns and derive a stable id"""
+    rule = {k: v.strip() if isinstance(v, str) else v for k, v in row.items() if v not in (None, "")}
+
+    if "interaction" not in rule:
+        drugs = [rule[c] for c in DRUG_COLUMNS if rule.get(c)]
+        if drugs:
+            rule["interaction"] = " + ".join(drugs)
+
+    if "id" not in rule and "interaction" in rule:
+        drug_key = "|".join(sorted(d.lower() for d in interaction_drugs(rule["interaction"])))
+        rule["id"] = "rule_" + hashlib.sha1(drug_key.encode('utf-8')).hexdigest()[:12]
+
+    return {k: rule[k] for k in REQUIRED_FIELDS + OPTIONAL_FIELDS if k in rule}
+
+
+def iter_chunks(rows: Iterator[Tuple[int, Dict]], chunk_size: int, report: Dict,
+                seen_ids: set) -> Iterator[List[Dict]]:
+    """Validate and de-duplicate rows, yielding lists of at most chunk_size rules"""
+    chunk = []
+    for line_no, row in rows:
+        report["rows"] += 1
+        error = row.get("_error") or validate_rule(rule := normalize_row(row))
+        if error:
+            report["invalid"] += 1
+            if len(report["errors"]) < 20:
+                report["errors"].append(f"line {line_no}: {error}")
+            continue
+        if rule["id"] in seen_ids:
+            report["duplicates"] += 1
+            continue
+        seen_ids.add(rule["id"])
+
+        chunk.append(rule)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def changed_rules(collection, chunk: List[Dict]) -> List[Dict]:
+    """Rules in chunk that are new or whose content differs from the stored copy"""
+    stored = collection.get(ids=[rule["id"] for rule in chunk], include=["metadatas"])
+    stored_hashes = {
+        rule_id: (metadata or {}).get(CONTENT_HASH_FIELD)
+        for rule_id, metadata in zip(stored["ids"], stored["metadatas"] or [])
+    }
+
+    changed = []
+    for rule in chunk:
+        content_hash = rule_content_hash(rule)
+        if stored_hashes.get(rule["id"]) != content_hash:
+            changed.append(dict(rule, **{CONTENT_HASH_FIELD: content_hash}))
+    return changed
+
+
+def iter_store(collection, include: List[str]) -> Iterator[Dict]:
+    """Page through the whole store"""
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def ingest(path: str, fmt: Optional[str] = None, chunk_size: int = 512, workers: int = 0,
+           prune: bool = False, dry_run: bool = False) -> Dict:
+    """
+    Stream a rule file into the persistent store
+
+    Args:
+        path: CSV or JSONL file of rules
+        fmt: "csv" or "jsonl" (default: from the file extension)
+        chunk_size: Rules validated, compared and embedded per chunk
+        workers: Embedding worker processes (0 embeds in this process)
+        prune: Delete stored rules that are absent from the file
+        dry_run: Validate and diff only, write nothing
+
+    Returns:
+        Ingestion report
+    """
+    started = time.perf_counter()
+    report = {"rows": 0, "invalid": 0, "duplicates": 0, "unchanged": 0,
+              "upserted": 0, "deleted": 0, "errors": []}
+
+    client = chromadb.PersistentClient(path=RULE_STORE_PATH)
+    embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+    with store_lock():
+        collection = open_rule_collection(client, embedding_fn)
+        if not dry_run and (collection.metadata or {}).get("rule_source", "builtin") == "builtin":
+            # Claim the store first: an API process finding an outdated
+            # builtin store would otherwise rebuild it under this import
+            collection.modify(metadata=dict(
+                collection.metadata or {}, rule_source=f"ingest:{os.path.basename(path)}"
+            ))
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers else None
+    # Bounded pipeline: at most 2 chunks per worker are embedding at any time
+    in_flight: deque = deque()
+    max_in_flight = max(workers * 2, 1)
+
+    def write(rules: List[Dict], embeddings):
+        collection.upsert(
+            ids=[rule["id"] for rule in rules],
+            documents=[rule_document(rule) for rule in rules],
+            embeddings=embeddings,
+            metadatas=rules
+        )
+        report["upserted"] += len(rules)
+
+    seen_ids: set = set()
+    try:
+        for chunk in iter_chunks(read_rows(path, fmt), chunk_size, report, seen_ids):
+            changed = changed_rules(collection, chunk)
+            report["unchanged"] += len(chunk) - len(changed)
+            if not changed or dry_run:
+                if dry_run:
+                    report["upserted"] += len(changed)
+                continue
+
+            documents = [rule_document(rule) for rule in changed]
+            if pool is None:
+                write(changed, embedding_fn(documents))
+                continue
+
+            in_flight.append((changed, pool.submit(_embed_in_worker, documents)))
+            while len(in_flight) >= max_in_flight:
+                rules, future = in_flight.popleft()
+                write(rules, future.result())
+
+        while in_flight:
+            rules, future = in_flight.popleft()
+            write(rules, future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    if prune:
+        stale = [
+            rule_id
+            for page in iter_store(collection, include=[])
+            for rule_id in page["ids"] if rule_id not in seen_ids
+        ]
+        report["deleted"] = len(stale)
+        if not dry_run:
+            for start in range(0, len(stale), PAGE_SIZE):
+                collection.delete(ids=stale[start:start + PAGE_SIZE])
+
+    if not dry_run:
+        # Stamp the version of everything now in the store
+        version = combine_version(
+            (metadata or {}).get(CONTENT_HASH_FIELD) or rule_content_hash(metadata or {})
+            for page in iter_store(collection, include=["metadatas"])
+            for metadata in page["metadatas"]
+        )
+        collection.modify(metadata=dict(
+            collection.metadata or {},
+            rule_set_version=version,
+            rule_source=f"ingest:{os.path.basename(path)}",
+            built_at=datetime.now().isoformat()
+        ))
+        report["rule_set_version"] = version
+        report["total_rules"] = collection.count()
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream interaction rules into the PrismCare rule store")
+    parser.add_argument("path", help="CSV or JSONL rule file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=0, help="Embedding worker processes")
+    parser.add_argument("--prune", action="store_true", help="Delete stored rules missing from the file")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and diff without writing")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print(f"📥 Ingesting {args.path} into {RULE_STORE_PATH}")
+    result = ingest(args.path, args.format, args.chunk_size, args.workers, args.prune, args.dry_run)
+
+    for error in result["errors"]:
+        print(f"  ⚠️  {error}")
+    print(f"✅ {result['rows']} rows: {result['upserted']} upserted, {result['unchanged']} unchanged, "
+          f"{result['invalid']} invalid, {result['duplicates']} duplicates, {result['deleted']} deleted "
+          f"({result['seconds']}s)")
+    if "rule_set_version" in result:
+        print(f"📦 Rule set version {result['rule_set_version']} ({result['total_rules']} rules)")
+        print("ℹ️  Running API processes pick it up within PRISMCARE_RULE_RELOAD_INTERVAL seconds "
+              "(or POST /api/admin/rules/reload)")
+    sys.exit(1 if result["invalid"] and not result["upserted"] else 0)
@@ -0,0 +1,114 @@
+"""
+Lazy AI engine loading
+Imports the AI engine (Chroma client, embedding model, rule index) off the
+request path and reports whether it is ready to serve
+"""
+
+from types import ModuleType
+from typing import Dict, Optional
+import importlib
+import threading
+import time
+
+STATE_IDLE = "idle"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class EngineNotReady(Exception):
+    """The engine is still warming up (or failed to start)"""
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LazyEngine:
+    """
+    Loads a module in a background thread the first time it is needed
+
+    After importing it, the module's warm_up() (if it has one) runs too, so
+    "ready" means the first request pays no model load. start() begins warm-up without blocking; get() waits a bounded time for
+    the module and raises EngineNotReady if it isn't available by then, so
+    callers can answer 503 instead of holding a request open indefinitely.
+    """
+
+    def __init__(self, module_name: str = "ai_engine", retry_after: int = 5):
+        self.module_name = module_name
+        self.retry_after = retry_after
+        self._module: Optional[ModuleType] = None
+        self._error: Optional[BaseException] = None
+        self._state = STATE_IDLE
+        self._started_at: Optional[float] = None
+        self._ready_seconds: Optional[float] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin warming up in the background (no-op if already started)"""
+        with self._lock:
+            if self._state != STATE_IDLE:
+                return
+            self._state = STATE_WARMING
+            self._started_at = time.perf_counter()
+        threading.Thread(target=self._load, name=f"{self.module_name}-warmup", daemon=True).start()
+
+    def _load(self):
+        try:
+            module = importlib.import_module(self.module_name)
+            warm_up = getattr(module, "warm_up", None)
+            if warm_up is not None:
+                warm_up()
+        except BaseException as e:
+            with self._lock:
+                self._error = e
+                self._state = STATE_FAILED
+        else:
+            with self._lock:
+                self._module = module
+                self._state = STATE_READY
+                self._ready_seconds = time.perf_counter() - self._started_at
+        finally:
+            self._ready.set()
+
+    def get(self, timeout: float = 0.0) -> ModuleType:
+        """
+        The loaded engine module, starting warm-up if needed
+
+        Args:
+            timeout: Seconds to wait for warm-up to finish
+
+        Raises:
+            EngineNotReady: Still warming up after timeout, or warm-up failed
+        """
+        if self._module is not None:
+            return self._module
+
+        self.start()
+        self._ready.wait(timeout)
+        if self._module is not None:
+            return self._module
+        if self._error is not None:
+            raise EngineNotReady(f"AI engine failed to start: {self._error}")
+        raise EngineNotReady("AI engine is warming up", retry_after=self.retry_after)
+
+    def peek(self) -> Optional[ModuleType]:
+        """The engine module if it is already loaded, without waiting or starting it"""
+        return self._module
+
+    @property
+    def ready(self) -> bool:
+        return self._module is not None
+
+    def status(self) -> Dict:
+        """Warm-up state for health checks"""
+        with self._lock:
+            status = {"state": self._state}
+            if self._state == STATE_WARMING:
+                status["warming_seconds"] = round(time.perf_counter() - self._started_at, 2)
+            elif self._state == STATE_READY:
+                status["warmup_seconds"] = round(self._ready_seconds, 2)
+            elif self._state == STATE_FAILED:
+                status["error"] = str(self._error)
+            return status
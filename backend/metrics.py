@@ -0,0 +1,405 @@
+"""
+Lightweight in-process metrics
+Counters, gauges and latency histograms rendered in Prometheus text format,
+optionally aggregated across worker processes through a shared directory
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import glob
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; merging dead workers isn't locked
+    fcntl = None
+
+# Latency buckets in seconds (sub-millisecond index hits up to slow ABDM calls)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(label_names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(label_names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self, values: Optional[Dict[Tuple, Any]] = None,
+               label_names: Optional[Sequence[str]] = None) -> List[str]:
+        """HELP/TYPE lines and samples (this process's, unless values are given)"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(
+            self.values() if values is None else values,
+            self.label_names if label_names is None else tuple(label_names)
+        ))
+        return lines
+
+    def values(self) -> Dict[Tuple, Any]:
+        """Current value per label tuple"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Forget recorded values (gauges and callbacks keep theirs)"""
+
+    def _samples(self, values: Dict[Tuple, Any], label_names: Sequence[str]) -> List[str]:
+        return [f"{self.name}{_format_labels(label_names, key)} {value}" for key, value in values.items()]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class CallbackMetric(_Metric):
+    """Metric whose samples are read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, kind: str, label_names: Sequence[str],
+                 callback: Callable[[], Dict[Tuple, float]]):
+        super().__init__(name, documentation, label_names)
+        self.kind = kind
+        self.callback = callback
+
+    def values(self) -> Dict[Tuple, float]:
+        try:
+            return dict(self.callback())
+        except Exception:
+            return {}
+
+
+class Histogram(_Metric):
+    """Bucketed latency distribution with sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the duration of a with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def values(self) -> Dict[Tuple, List[float]]:
+        """Per label tuple: [per-bucket counts..., +Inf count, sum]"""
+        with self._lock:
+            return {key: list(series) for key, series in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self, values: Dict[Tuple, List[float]], label_names: Sequence[str]) -> List[str]:
+        lines = []
+        for key, series in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(label_names, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(label_names, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(label_names, key)} {cumulative}")
+        return lines
+
+
+class MultiProcessCollector:
+    """
+    Aggregates metrics across worker processes through a shared directory
+
+    Each worker writes its values to <directory>/<pid>.json every `interval`
+    seconds (and right before it renders a scrape). Whichever worker serves
+    /metrics merges every file: counters and histograms are summed, gauges
+    are reported per worker with a pid label. A worker that exits folds
+    its counters and histograms into dead.json, so totals never go down
+    when workers are recycled (Prometheus would read that as a reset).
+    Other workers' values are up to `interval` seconds old.
+    """
+
+    DEAD_FILE = "dead.json"
+    LOCK_FILE = "metrics.lock"
+
+    def __init__(self, directory: str, interval: float = 5.0):
+        self.directory = directory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def clear(directory: str):
+        """Remove every worker's values (at server start, before any worker runs)"""
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(self.LOCK_FILE), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _export(self) -> Dict[str, Dict]:
+        with _registry_lock:
+            metrics = list(_registry)
+        return {
+            metric.name: {"kind": metric.kind, "values": [[list(key), value] for key, value in metric.values().items()]}
+            for metric in metrics
+        }
+
+    def _write(self, name: str, data: Dict):
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, name: str) -> Optional[Dict]:
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def dump(self):
+        """Write this process's current values"""
+        self._write(f"{os.getpid()}.json", self._export())
+
+    def render(self) -> str:
+        """Every worker's metrics, merged, in Prometheus text format"""
+        self.dump()
+        merged: Dict[str, Dict[Tuple, Any]] = {}
+        with self._locked(exclusive=False):
+            files = [(os.path.basename(path)[:-len(".json")], self._read(os.path.basename(path)))
+                     for path in glob.glob(os.path.join(self.directory, "*.json"))]
+
+        for pid, data in files:
+            for name, metric in (data or {}).items():
+                target = merged.setdefault(name, {})
+                for key, value in metric["values"]:
+                    if metric["kind"] == "gauge":
+                        # A killed worker's file stays behind; drop its gauges
+                        if pid != "dead" and _alive(int(pid)):
+                            target[tuple(key) + (pid,)] = value
+                    else:
+                        _accumulate(target, tuple(key), value)
+
+        with _registry_lock:
+            metrics = list(_registry)
+        lines = []
+        for metric in metrics:
+            values = merged.get(metric.name, {})
+            label_names = metric.label_names + (("pid",) if metric.kind == "gauge" else ())
+            lines.extend(metric.render(values, label_names))
+        return "\n".join(lines) + "\n"
+
+    def mark_dead(self):
+        """Fold this exiting worker's counters and histograms into dead.json"""
+        own = self._export()
+        with self._locked(exclusive=True):
+            dead = self._read(self.DEAD_FILE) or {}
+            for name, metric in own.items():
+                if metric["kind"] == "gauge":
+                    continue
+                target = {tuple(key): value for key, value in dead.get(name, {}).get("values", [])}
+                for key, value in metric["values"]:
+                    _accumulate(target, tuple(key), value)
+                dead[name] = {"kind": metric["kind"], "values": [[list(key), value] for key, value in target.items()]}
+            self._write(self.DEAD_FILE, dead)
+            try:
+                os.remove(self._path(f"{os.getpid()}.json"))
+            except OSError:
+                pass
+
+    def start(self):
+        """Start writing this process's values in the background"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"⚠️  Metrics dump failed, will retry: {e}")
+
+    def close(self):
+        """Stop the background writer (e.g. before fork)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def reopen(self):
+        """
+        Start over in a forked worker
+
+        Counts inherited from the preloading parent are dropped so they
+        aren't reported once per worker.
+        """
+        with _registry_lock:
+            metrics = list(_registry)
+        for metric in metrics:
+            metric.reset()
+        self._stop = threading.Event()
+        self._thread = None
+        self.start()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _accumulate(target: Dict[Tuple, Any], key: Tuple, value: Any):
+    """Add a counter value or histogram series into target[key]"""
+    current = target.get(key)
+    if current is None:
+        target[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        target[key] = [a + b for a, b in zip(current, value)]
+    else:
+        target[key] = current + value
+
+
+_collector: Optional[MultiProcessCollector] = None
+
+
+def enable_multiprocess(directory: str, interval: float = 5.0) -> MultiProcessCollector:
+    """Aggregate /metrics across the processes sharing `directory` (see MultiProcessCollector)"""
+    global _collector
+    _collector = MultiProcessCollector(directory, interval)
+    return _collector
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text exposition format"""
+    if _collector is not None:
+        return _collector.render()
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Shared metrics, recorded by the engine, the ABDM client and the API
+STAGE_SECONDS = Histogram(
+    "prismcare_stage_seconds",
+    "Time spent in each processing stage",
+    ("stage",)
+)
+ABDM_REQUEST_SECONDS = Histogram(
+    "prismcare_abdm_request_seconds",
+    "ABDM FHIR request latency by resource",
+    ("resource", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "prismcare_http_request_seconds",
+    "API request latency by endpoint",
+    ("endpoint", "method", "status")
+)
+ERRORS_TOTAL = Counter(
+    "prismcare_errors_total",
+    "Errors by component",
+    ("component", "kind")
+)
+RULES_LOADED = Gauge(
+    "prismcare_rules_loaded",
+    "Interaction rules in the active rule set"
+)
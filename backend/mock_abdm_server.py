@@ -4,8 +4,18 @@ Simulates government health records server with FHIR-compliant endpoints
 Port: 8080
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qsl
+from result_cache import TTLCache
+from synthetic_population import SyntheticPopulation
 
 app = Flask(__name__)
 
@@ -72,29 +82,121 @@ PATIENTS_DB = {
     }
 }
 
-@app.route('/fhir/Patient', methods=['GET'])
-def get_patient():
+# Optional generated population (see --population), served alongside PATIENTS_DB
+SYNTHETIC_POPULATION: Optional[SyntheticPopulation] = None
+
+# Patients changed through the API (demo or synthetic), consulted first
+PATIENT_UPDATES: Dict[str, dict] = {}
+# Bumped on every update, so a render of an older record isn't cached over a newer one
+_patient_versions: Dict[str, int] = {}
+_updates_lock = threading.Lock()
+
+# Serialized responses per patient (see render_patient). Entries are rebuilt
+# when the patient changes, and hourly so birthDate follows the calendar year.
+RENDER_CACHE_SIZE = 20000
+RENDER_TTL = 3600.0
+render_cache = TTLCache(maxsize=RENDER_CACHE_SIZE, ttl=RENDER_TTL)
+
+# Fault injection per Flask endpoint name; "*" applies to endpoints without
+# their own entry. Latency/jitter in milliseconds, error_rate in [0, 1].
+FAULTS = {
+    "*": {"latency_ms": 0.0, "jitter_ms": 0.0, "error_rate": 0.0}
+}
+FAULT_EXEMPT_ENDPOINTS = {"health_check", "get_faults", "set_faults"}
+fault_rng = random.Random()
+
+def find_patient(patient_id: str) -> Optional[dict]:
+    """Look up a patient in updated, then fixed demo records, then the synthetic population"""
+    patient = PATIENT_UPDATES.get(patient_id) or PATIENTS_DB.get(patient_id)
+    if patient is None and SYNTHETIC_POPULATION is not None:
+        patient = SYNTHETIC_POPULATION.get(patient_id)
+    return patient
+
+def patient_count() -> int:
+    return len(PATIENTS_DB) + (len(SYNTHETIC_POPULATION) if SYNTHETIC_POPULATION else 0)
+
+def patients_from(offset: int, count: int) -> list:
     """
-    FHIR-compliant endpoint to retrieve patient demographics
-    Query param: identifier (ABHA ID)
+    Patients [offset, offset + count) in a stable order: the demo records,
+    then the synthetic population
     """
-    identifier = request.args.get('identifier')
-    
-    if not identifier:
-        return jsonify({
-            "error": "Missing identifier parameter"
-        }), 400
+    demo = list(PATIENTS_DB.values())
+    patients = demo[offset:offset + count]
+    if SYNTHETIC_POPULATION is not None:
+        start = max(offset - len(demo), 0)
+        end = min(offset + count - len(demo), len(SYNTHETIC_POPULATION))
+        patients.extend(SYNTHETIC_POPULATION.record(i) for i in range(start, end))
+    if PATIENT_UPDATES:
+        patients = [PATIENT_UPDATES.get(patient["id"], patient) for patient in patients]
+    return patients
+
+@app.before_request
+def inject_faults():
+    """Simulate slow or failing ABDM responses for load tests"""
+    if request.endpoint is None or request.endpoint in FAULT_EXEMPT_ENDPOINTS:
+        return None
     
-    patient = PATIENTS_DB.get(identifier)
+    fault = FAULTS.get(request.endpoint, FAULTS["*"])
+    delay_ms = fault["latency_ms"] + fault_rng.uniform(-1, 1) * fault["jitter_ms"]
+    if delay_ms > 0:
+        time.sleep(delay_ms / 1000)
     
-    if not patient:
+    if fault["error_rate"] > 0 and fault_rng.random() < fault["error_rate"]:
         return jsonify({
-            "error": "Patient not found",
-            "identifier": identifier
-        }), 404
+            "error": "Injected fault",
+            "endpoint": request.endpoint
+        }), 503
+    return None
+
+@app.route('/admin/faults', methods=['GET'])
+def get_faults():
+    """Current fault injection settings"""
+    return jsonify(FAULTS), 200
+
+@app.route('/admin/faults', methods=['PUT'])
+def set_faults():
+    """
+    Update fault injection settings at runtime
+    Body: {"<endpoint or *>": {"latency_ms": .., "jitter_ms": .., "error_rate": ..}}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        updated = {
+            endpoint: parse_fault(fault, FAULTS.get(endpoint, FAULTS["*"]))
+            for endpoint, fault in data.items()
+        }
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({
+            "error": f"Invalid fault settings: {str(e)}"
+        }), 400
     
-    # FHIR-compliant response structure
-    return jsonify({
+    FAULTS.update(updated)
+    return jsonify(FAULTS), 200
+
+def parse_fault(fault: dict, base: dict) -> dict:
+    """Merge a partial fault spec over base, validating the values"""
+    merged = {key: float(fault.get(key, base[key])) for key in base}
+    if not 0 <= merged["error_rate"] <= 1:
+        raise ValueError("error_rate must be between 0 and 1")
+    return merged
+
+def serialize(resource) -> bytes:
+    """Canonical JSON bytes (sorted keys, no whitespace)"""
+    return json.dumps(resource, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def fhir_response(rendered: Tuple[bytes, str]):
+    """
+    Pre-serialized JSON response with its content-hash ETag
+    Answers 304 Not Modified when the client's If-None-Match still matches
+    """
+    body, etag = rendered
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def patient_resource(patient: dict) -> dict:
+    """FHIR Patient resource for a mock patient"""
+    return {
         "resourceType": "Patient",
         "id": patient["id"],
         "identifier": [{
@@ -107,30 +209,10 @@ def get_patient():
         "gender": patient["gender"].lower(),
         "birthDate": str(datetime.now().year - patient["age"]) + "-01-01",
         "age": patient["age"]
-    }), 200
+    }
 
-@app.route('/fhir/MedicationRequest', methods=['GET'])
-def get_medication_history():
-    """
-    FHIR-compliant endpoint to retrieve patient's medication history
-    Query param: patient (ABHA ID)
-    """
-    patient_id = request.args.get('patient')
-    
-    if not patient_id:
-        return jsonify({
-            "error": "Missing patient parameter"
-        }), 400
-    
-    patient = PATIENTS_DB.get(patient_id)
-    
-    if not patient:
-        return jsonify({
-            "error": "Patient not found",
-            "patient": patient_id
-        }), 404
-    
-    # FHIR-compliant medication request bundle
+def medication_request_resources(patient: dict) -> list:
+    """FHIR MedicationRequest resources for a mock patient"""
     medication_requests = []
     for med in patient["medication_history"]:
         medication_requests.append({
@@ -141,7 +223,7 @@ def get_medication_history():
                 "text": med["medicine"]
             },
             "subject": {
-                "reference": f"Patient/{patient_id}"
+                "reference": f"Patient/{patient['id']}"
             },
             "dosageInstruction": [{
                 "text": f"{med['dosage']} {med['frequency']}",
@@ -158,13 +240,273 @@ def get_medication_history():
             }],
             "authoredOn": med["start_date"]
         })
+    return medication_requests
+
+def bundle_bytes(entries: List[bytes], total: Optional[int] = None, bundle_type: str = "searchset",
+                 links: Optional[list] = None) -> bytes:
+    """Bundle JSON assembled from pre-serialized entries (same bytes as serialize() would give)"""
+    body = b'{"entry":[' + b','.join(entries) + b']'
+    if links is not None:
+        body += b',"link":' + serialize(links)
+    body += b',"resourceType":"Bundle"'
+    if total is not None:
+        body += b',"total":' + str(total).encode()
+    return body + b',"type":' + serialize(bundle_type) + b'}'
+
+def entry_bytes(resource: bytes, mode: Optional[str] = None) -> bytes:
+    """One Bundle entry around a pre-serialized resource"""
+    if mode is None:
+        return b'{"resource":' + resource + b'}'
+    return b'{"resource":' + resource + b',"search":{"mode":"' + mode.encode() + b'"}}'
+
+def with_etag(body: bytes) -> Tuple[bytes, str]:
+    return body, hashlib.sha1(body).hexdigest()
+
+def render_patient(patient: dict) -> Dict:
+    """
+    Serialize everything served for one patient, once
     
-    return jsonify({
-        "resourceType": "Bundle",
-        "type": "searchset",
-        "total": len(medication_requests),
-        "entry": [{"resource": req} for req in medication_requests]
-    }), 200
+    The Patient and each MedicationRequest are serialized individually; the
+    MedicationRequest and $everything Bundles are spliced together from
+    those bytes, and each response carries the SHA-1 of its body as ETag.
+    """
+    patient_json = serialize(patient_resource(patient))
+    requests_json = [serialize(req) for req in medication_request_resources(patient)]
+    return {
+        "patient_json": patient_json,
+        "medication_requests_json": requests_json,
+        "patient": with_etag(patient_json),
+        "medications": with_etag(bundle_bytes(
+            [entry_bytes(req) for req in requests_json], len(requests_json)
+        )),
+        "everything": with_etag(bundle_bytes(
+            [entry_bytes(patient_json)] + [entry_bytes(req) for req in requests_json],
+            len(requests_json) + 1
+        ))
+    }
+
+def rendered_patient(patient_id: str, patient: Optional[dict] = None,
+                     store: bool = True) -> Optional[Dict]:
+    """
+    Cached render_patient() output for a patient, or None if there's no such patient
+    
+    Args:
+        patient: The record, when the caller already has it
+        store: Keep a fresh render in the cache (paging through everyone shouldn't
+            evict the patients being looked up individually)
+    """
+    rendered = render_cache.get(patient_id)
+    if rendered is None:
+        version = _patient_versions.get(patient_id, 0)
+        patient = patient or find_patient(patient_id)
+        if patient is None:
+            return None
+        rendered = render_patient(patient)
+        if store:
+            # An update landing mid-render has already cached the newer record
+            with _updates_lock:
+                if _patient_versions.get(patient_id, 0) == version:
+                    render_cache.put(patient_id, rendered)
+    return rendered
+
+@app.route('/fhir/Patient', methods=['GET'])
+def get_patient():
+    """
+    FHIR-compliant endpoint to retrieve patient demographics
+    Query param: identifier (ABHA ID)
+    Query param: _revinclude=MedicationRequest:patient returns a Bundle with medications
+    """
+    identifier = request.args.get('identifier')
+    
+    if not identifier and request.args.get('_count'):
+        return search_patients()
+    
+    if not identifier:
+        return jsonify({
+            "error": "Missing identifier parameter"
+        }), 400
+    
+    rendered = rendered_patient(identifier)
+    
+    if not rendered:
+        return jsonify({
+            "error": "Patient not found",
+            "identifier": identifier
+        }), 404
+    
+    if request.args.get('_revinclude') == 'MedicationRequest:patient':
+        return fhir_response(rendered["everything"])
+    
+    # FHIR-compliant response structure
+    return fhir_response(rendered["patient"])
+
+MAX_PAGE_SIZE = 1000
+
+def search_patients():
+    """
+    Page through every patient (FHIR search with _count)
+    Each page is a searchset Bundle; with _revinclude=MedicationRequest:patient it also
+    carries the patients' MedicationRequests. The "next" link holds an opaque cursor.
+    """
+    try:
+        count = min(int(request.args['_count']), MAX_PAGE_SIZE)
+        offset = int(request.args.get('_cursor', 0))
+        if count <= 0 or offset < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            "error": "_count and _cursor must be non-negative integers"
+        }), 400
+    
+    include_medications = request.args.get('_revinclude') == 'MedicationRequest:patient'
+    entries = []
+    for patient in patients_from(offset, count):
+        rendered = rendered_patient(patient["id"], patient, store=False)
+        entries.append(entry_bytes(rendered["patient_json"], "match"))
+        if include_medications:
+            entries.extend(entry_bytes(req, "include") for req in rendered["medication_requests_json"])
+    
+    total = patient_count()
+    links = [{"relation": "self", "url": request.full_path}]
+    if offset + count < total:
+        query = f"_count={count}&_cursor={offset + count}"
+        if include_medications:
+            query += "&_revinclude=MedicationRequest:patient"
+        links.append({"relation": "next", "url": f"/fhir/Patient?{query}"})
+    
+    return Response(bundle_bytes(entries, total, links=links), mimetype='application/json'), 200
+
+@app.route('/fhir/MedicationRequest', methods=['GET'])
+def get_medication_history():
+    """
+    FHIR-compliant endpoint to retrieve patient's medication history
+    Query param: patient (ABHA ID)
+    """
+    patient_id = request.args.get('patient')
+    
+    if not patient_id:
+        return jsonify({
+            "error": "Missing patient parameter"
+        }), 400
+    
+    rendered = rendered_patient(patient_id)
+    
+    if not rendered:
+        return jsonify({
+            "error": "Patient not found",
+            "patient": patient_id
+        }), 404
+    
+    # FHIR-compliant medication request bundle
+    return fhir_response(rendered["medications"])
+
+@app.route('/fhir/MedicationRequest', methods=['POST'])
+def create_medication_request():
+    """
+    Record a new MedicationRequest for a patient (FHIR create)
+    Only that patient's cached responses are rebuilt
+    """
+    resource = request.get_json(silent=True) or {}
+    patient_id = resource.get('subject', {}).get('reference', '').partition('Patient/')[2]
+    medicine = resource.get('medicationCodeableConcept', {}).get('text')
+    
+    if resource.get('resourceType') != 'MedicationRequest' or not patient_id or not medicine:
+        return jsonify({
+            "error": "Expected a MedicationRequest with subject.reference and medicationCodeableConcept.text"
+        }), 400
+    
+    dosage = (resource.get('dosageInstruction') or [{}])[0]
+    medication = {
+        "medicine": medicine,
+        "dosage": ((dosage.get('doseAndRate') or [{}])[0].get('doseQuantity') or {}).get('value', ''),
+        "frequency": dosage.get('timing', {}).get('repeat', {}).get('frequency', ''),
+        "start_date": resource.get('authoredOn', datetime.now().date().isoformat()),
+        "status": resource.get('status', 'active')
+    }
+    
+    with _updates_lock:
+        patient = find_patient(patient_id)
+        if not patient:
+            return jsonify({
+                "error": "Patient not found",
+                "patient": patient_id
+            }), 404
+        
+        updated = dict(patient, medication_history=patient["medication_history"] + [medication])
+        PATIENT_UPDATES[patient_id] = updated
+        _patient_versions[patient_id] = _patient_versions.get(patient_id, 0) + 1
+        render_cache.invalidate(patient_id)
+        render_cache.put(patient_id, render_patient(updated))
+    
+    created = medication_request_resources({"id": patient_id, "medication_history": [medication]})[0]
+    return jsonify(created), 201
+
+@app.route('/fhir/Patient/<patient_id>/$everything', methods=['GET'])
+def get_patient_everything(patient_id):
+    """
+    FHIR Patient/$everything: demographics and medication history in one Bundle
+    """
+    rendered = rendered_patient(patient_id)
+    
+    if not rendered:
+        return jsonify({
+            "error": "Patient not found",
+            "patient": patient_id
+        }), 404
+    
+    return fhir_response(rendered["everything"])
+
+def resolve_batch_request(url: str):
+    """
+    Resolve one batch entry's GET url to (status, (body, etag))
+    Supports Patient/<id>/$everything, Patient?identifier=<id> and
+    MedicationRequest?patient=<id>
+    """
+    path, _, query = url.lstrip('/').partition('?')
+    params = dict(parse_qsl(query))
+    parts = path.split('/')
+    
+    if len(parts) == 3 and parts[0] == 'Patient' and parts[2] == '$everything':
+        patient_id, kind = parts[1], "everything"
+    elif path == 'Patient' and 'identifier' in params:
+        patient_id, kind = params['identifier'], "patient"
+    elif path == 'MedicationRequest' and 'patient' in params:
+        patient_id, kind = params['patient'], "medications"
+    else:
+        return "400 Bad Request", None
+    
+    rendered = rendered_patient(patient_id)
+    return ("200 OK", rendered[kind]) if rendered else ("404 Not Found", None)
+
+@app.route('/fhir', methods=['POST'])
+def process_batch():
+    """
+    FHIR batch endpoint: one POSTed Bundle of GET requests, one batch-response
+    Lets clients fetch many patients in a single round trip
+    """
+    bundle = request.get_json(silent=True) or {}
+    
+    if bundle.get('resourceType') != 'Bundle' or bundle.get('type') != 'batch':
+        return jsonify({
+            "error": "Expected a Bundle of type batch"
+        }), 400
+    
+    entries = []
+    for entry in bundle.get('entry', []):
+        req = entry.get('request', {})
+        if req.get('method', 'GET') != 'GET':
+            status, rendered = "405 Method Not Allowed", None
+        else:
+            status, rendered = resolve_batch_request(req.get('url', ''))
+        
+        if rendered is None:
+            entries.append(b'{"response":' + serialize({"status": status}) + b'}')
+        else:
+            body, etag = rendered
+            entries.append(b'{"resource":' + body + b',"response":'
+                           + serialize({"etag": f'"{etag}"', "status": status}) + b'}')
+    
+    return Response(bundle_bytes(entries, bundle_type="batch-response"), mimetype='application/json'), 200
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -172,19 +514,76 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "service": "Mock ABDM Server",
+        "render_cache": render_cache.stats(),
         "timestamp": datetime.now().isoformat()
     }), 200
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mock ABDM FHIR server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--population", type=int, default=0,
+                        help="Generate this many synthetic patients (IDs SYN00000000...)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the population and faults")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency for every FHIR endpoint")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--fault", action="append", default=[], metavar="ENDPOINT=LATENCY,JITTER,RATE",
+                        help="Per-endpoint override, e.g. get_patient_everything=50,10,0.01")
+    parser.add_argument("--render-cache-size", type=int, default=RENDER_CACHE_SIZE,
+                        help="Patients whose serialized responses are kept in memory")
+    parser.add_argument("--precompute", action="store_true",
+                        help="Serialize responses for the first --render-cache-size patients at startup")
+    parser.add_argument("--no-debug", action="store_true", help="Disable Flask debug mode and reloader")
+    return parser.parse_args()
+
 if __name__ == '__main__':
+    args = parse_args()
+    
+    fault_rng.seed(args.seed)
+    FAULTS["*"] = parse_fault({
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate
+    }, FAULTS["*"])
+    for spec in args.fault:
+        endpoint, _, values = spec.partition("=")
+        latency, jitter, rate = values.split(",")
+        FAULTS[endpoint] = parse_fault(
+            {"latency_ms": latency, "jitter_ms": jitter, "error_rate": rate}, FAULTS["*"]
+        )
+    
+    if args.population:
+        started = time.perf_counter()
+        SYNTHETIC_POPULATION = SyntheticPopulation(args.population, seed=args.seed)
+        print(f"🧬 Generated {args.population} synthetic patients in {time.perf_counter() - started:.1f}s")
+    
+    render_cache = TTLCache(maxsize=args.render_cache_size, ttl=RENDER_TTL)
+    if args.precompute:
+        started = time.perf_counter()
+        warm = min(patient_count(), args.render_cache_size)
+        for offset in range(0, warm, MAX_PAGE_SIZE):
+            for patient in patients_from(offset, min(MAX_PAGE_SIZE, warm - offset)):
+                render_cache.put(patient["id"], render_patient(patient))
+        print(f"📦 Pre-serialized responses for {warm} patients in {time.perf_counter() - started:.1f}s")
+    
     print("=" * 60)
     print("🏥 Mock ABDM Server Starting...")
     print("=" * 60)
-    print(f"📍 Running on: http://localhost:8080")
-    print(f"📊 Mock Patients: {len(PATIENTS_DB)}")
+    print(f"📍 Running on: http://localhost:{args.port}")
+    print(f"📊 Mock Patients: {patient_count()}")
     print("\n📋 Available Endpoints:")
     print("  GET /fhir/Patient?identifier=<ABHA_ID>")
     print("  GET /fhir/MedicationRequest?patient=<ABHA_ID>")
+    print("  POST /fhir/MedicationRequest")
+    print("  GET /fhir/Patient/<ABHA_ID>/$everything")
+    print("  GET /fhir/Patient?_count=<N>&_revinclude=MedicationRequest:patient (paged)")
+    print("  POST /fhir (batch Bundle)")
+    print("  GET/PUT /admin/faults")
     print("  GET /health")
     print("\n💡 Sample ABHA IDs: ABHA001, ABHA002, ABHA003")
+    if args.population:
+        print(f"💡 Synthetic IDs: {SyntheticPopulation.patient_id(0)} .. {SyntheticPopulation.patient_id(args.population - 1)}")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    # The reloader would re-run the population generator in a second process
+    app.run(host='0.0.0.0', port=args.port, debug=not args.no_debug,
+            use_reloader=not args.no_debug and not args.population)
@@ -0,0 +1,286 @@
+"""
+Append-only override journal
+Doctor overrides stored in SQLite with group-committed appends
+"""
+
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+from stats_store import connect
+
+# Columns auditors can filter on; each gets a (column, id) index so filtered
+# keyset pages are index range scans
+FILTER_FIELDS = ("doctor_id", "patient_id", "drug", "risk_level", "status")
+
+OVERRIDE_FIELDS = (
+    "timestamp",
+    "doctor_id",
+    "doctor_name",
+    "patient_id",
+    "drug",
+    "risk_level",
+    "reason",
+    "status"
+)
+
+
+class OverrideJournal:
+    """
+    Append-only log of doctor overrides
+
+    IDs come from SQLite's AUTOINCREMENT rowid, so they are allocated
+    atomically even with several writer processes. Appends from concurrent
+    requests are queued and committed together by one writer thread, paying
+    a single fsync per group. Entries are never updated or deleted; ids
+    increase with insertion order but may have gaps, so each entry also gets
+    a dense position (seq = 1, 2, 3...) assigned inside the writing
+    transaction. Offset pages are then seq range scans and the entry count
+    is the highest seq, both read through the seq index.
+    """
+
+    def __init__(self, db_path: str, legacy_json: Optional[str] = None,
+                 max_group_size: int = 256):
+        self.db_path = db_path
+        self.max_group_size = max_group_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._atexit_registered = False
+        self._conn = connect(db_path)
+        self._init_schema(legacy_json)
+
+    def _init_schema(self, legacy_json: Optional[str]):
+        """Create the journal table, importing an old overrides.json once"""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'overrides'"
+            ).fetchone()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS overrides ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "timestamp TEXT NOT NULL, doctor_id TEXT NOT NULL, doctor_name TEXT, "
+                "patient_id TEXT NOT NULL, drug TEXT NOT NULL, risk_level TEXT, "
+                "reason TEXT NOT NULL, status TEXT, legacy_id INTEGER, seq INTEGER)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(overrides)")}
+            if "legacy_id" not in columns:
+                conn.execute("ALTER TABLE overrides ADD COLUMN legacy_id INTEGER")
+            if "seq" not in columns:
+                # Journals from before seq existed: number their rows in id order once
+                conn.execute("ALTER TABLE overrides ADD COLUMN seq INTEGER")
+                ids = [row[0] for row in conn.execute("SELECT id FROM overrides ORDER BY id")]
+                conn.executemany(
+                    "UPDATE overrides SET seq = ? WHERE id = ?",
+                    ((seq, row_id) for seq, row_id in enumerate(ids, start=1))
+                )
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_overrides_seq ON overrides (seq)")
+            for field in FILTER_FIELDS:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_overrides_{field} ON overrides ({field}, id)"
+                )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_overrides_timestamp ON overrides (timestamp, id)"
+            )
+
+            if not exists and legacy_json and os.path.exists(legacy_json):
+                with open(legacy_json, 'r') as f:
+                    legacy = json.load(f)
+                # The old len()+1 scheme could hand out the same id twice, so
+                # legacy rows get fresh ids and keep theirs as legacy_id
+                conn.executemany(
+                    f"INSERT INTO overrides ({', '.join(OVERRIDE_FIELDS)}, legacy_id, seq) "
+                    f"VALUES ({', '.join('?' * (len(OVERRIDE_FIELDS) + 2))})",
+                    [
+                        [entry.get(field) for field in OVERRIDE_FIELDS] + [entry.get('id'), seq]
+                        for seq, entry in enumerate(legacy, start=1)
+                    ]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def start(self):
+        """Start the group-commit writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="override-writer", daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+    def append(self, entry: Dict, timeout: float = 10.0) -> Dict:
+        """
+        Durably append one override
+
+        Args:
+            entry: Override fields (without an id)
+            timeout: Seconds to wait for the group commit
+
+        Returns:
+            The stored entry including its allocated id
+        """
+        future: Future = Future()
+        self._queue.put((entry, future))
+        return future.result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Whatever queued up while we waited goes into the same commit
+            group = [item]
+            while len(group) < self.max_group_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                group.append(item)
+
+            self._commit_group(group)
+
+    def _commit_group(self, group: List):
+        conn = self._conn
+        try:
+            with self._read_lock:
+                conn.execute("BEGIN IMMEDIATE")
+                # The write lock is held from here to COMMIT, so no other
+                # process can take the same seq
+                last_seq = self._last_seq(conn)
+                stored = []
+                for seq, (entry, _) in enumerate(group, start=last_seq + 1):
+                    cursor = conn.execute(
+                        f"INSERT INTO overrides ({', '.join(OVERRIDE_FIELDS)}, seq) "
+                        f"VALUES ({', '.join('?' * (len(OVERRIDE_FIELDS) + 1))})",
+                        [entry.get(field) for field in OVERRIDE_FIELDS] + [seq]
+                    )
+                    stored.append(dict(entry, id=cursor.lastrowid))
+                conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in group:
+                future.set_exception(e)
+            return
+
+        for (_, future), entry in zip(group, stored):
+            future.set_result(entry)
+
+    @staticmethod
+    def _last_seq(conn: sqlite3.Connection) -> int:
+        """Highest seq handed out, i.e. the number of entries (one seq index lookup)"""
+        return conn.execute("SELECT MAX(seq) FROM overrides").fetchone()[0] or 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """The open connection, reconnecting if the journal was closed (call with _read_lock held)"""
+        if self._conn is None:
+            self._conn = connect(self.db_path)
+        return self._conn
+
+    def _select(self, sql: str, params=()) -> List[Dict]:
+        with self._read_lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [dict(zip(("id",) + OVERRIDE_FIELDS, row)) for row in rows]
+
+    def count(self) -> int:
+        """Number of entries in the journal"""
+        with self._read_lock:
+            return self._last_seq(self._connection())
+
+    def page(self, page: int, per_page: int) -> List[Dict]:
+        """One page of overrides in insertion order (a seq range scan, so any page is cheap)"""
+        return self._select(
+            f"SELECT id, {', '.join(OVERRIDE_FIELDS)} FROM overrides "
+            "WHERE seq > ? ORDER BY seq LIMIT ?",
+            (max(page - 1, 0) * per_page, per_page)
+        )
+
+    def search(self, filters: Optional[Dict[str, str]] = None, since: Optional[str] = None,
+               until: Optional[str] = None, cursor: Optional[int] = None,
+               limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Filtered overrides, newest first, with keyset (cursor) pagination
+
+        Args:
+            filters: Exact matches on FILTER_FIELDS columns
+            since: Inclusive lower bound on the ISO timestamp
+            until: Exclusive upper bound on the ISO timestamp
+            cursor: Only return entries with an id below this (from next_cursor)
+            limit: Page size
+
+        Returns:
+            (entries, next_cursor) - next_cursor is None on the last page
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        clauses = []
+        params: List = []
+
+        for field, value in (filters or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter overrides by {field}")
+            clauses.append(f"{field} = ?")
+            params.append(value)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        # Fetch one extra row to know whether another page exists
+        rows = self._select(
+            f"SELECT id, {', '.join(OVERRIDE_FIELDS)} FROM overrides "
+            f"{where}ORDER BY id DESC LIMIT ?",
+            params + [limit + 1]
+        )
+
+        if rows and len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1]['id']
+        return rows, None
+
+    def tail(self, limit: int = 10) -> List[Dict]:
+        """Most recent overrides, oldest first"""
+        rows = self._select(
+            f"SELECT id, {', '.join(OVERRIDE_FIELDS)} FROM overrides "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        return rows[::-1]
+
+    def close(self):
+        """Drain queued appends, stop the writer thread and close the connection"""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+        with self._read_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def reopen(self):
+        """Open a fresh connection and writer after close() (e.g. in a forked worker)"""
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._thread = None
+        self._conn = connect(self.db_path)
+        self.start()
@@ -0,0 +1,277 @@
+"""
+Profiling hooks
+Sampled per-request cProfile profiles (by rate or request header) and a
+startup report of import and initialization time per module; both opt-in
+
+Usage:
+    python profiling.py startup                       # import + init breakdown of ai_engine
+    python profiling.py startup --module app --json
+    python profiling.py top profiles/validate_prescription -n 30
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Mapping, Optional
+import argparse
+import cProfile
+import glob
+import json
+import os
+import pstats
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+
+PROFILE_SUFFIX = ".prof"
+
+_phases: List[Dict] = []
+_phases_lock = threading.Lock()
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Record how long one initialization step (e.g. opening the rule store) took"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        with _phases_lock:
+            _phases.append({"phase": name, "seconds": round(seconds, 4)})
+
+
+def startup_phases() -> List[Dict]:
+    """Initialization steps recorded in this process, in the order they finished"""
+    with _phases_lock:
+        return list(_phases)
+
+
+class RequestProfiler:
+    """
+    Samples requests into cProfile profiles, one file per request
+
+    A request is profiled when it carries the trigger header (if one is
+    configured) or wins a `rate` coin toss. Only one request per process is
+    profiled at a time; others that would be sampled meanwhile are skipped,
+    which bounds the overhead and keeps profiles from overlapping. Profiles
+    are written to <directory>/<endpoint>/ and only the newest `keep` per
+    endpoint are kept.
+    """
+
+    def __init__(self, directory: str, rate: float = 0.0, header: Optional[str] = None,
+                 keep: int = 50, sample: Callable[[], float] = random.random):
+        self.directory = directory
+        self.rate = rate
+        self.header = header or None
+        self.keep = keep
+        self._sample = sample
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self.written = 0
+        self.skipped_busy = 0
+        self.last_profile: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 or self.header is not None
+
+    def start(self, headers: Mapping[str, str]) -> Optional[cProfile.Profile]:
+        """Begin profiling the current request if it is sampled"""
+        if not (self.header and headers.get(self.header)) and not (self.rate and self._sample() < self.rate):
+            return None
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.skipped_busy += 1
+            return None
+
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile: cProfile.Profile, endpoint: str, method: str,
+               status: int, seconds: float) -> str:
+        """Stop profiling and write the profile; returns its path"""
+        self.abandon(profile)
+
+        endpoint_dir = os.path.join(self.directory, endpoint)
+        os.makedirs(endpoint_dir, exist_ok=True)
+        name = (f"{datetime.now().strftime('%Y%m%dT%H%M%S.%f')}-{method}-{status}-"
+                f"{seconds * 1000:.0f}ms-{os.getpid()}{PROFILE_SUFFIX}")
+        path = os.path.join(endpoint_dir, name)
+        profile.dump_stats(path)
+        self._prune(endpoint_dir)
+
+        with self._lock:
+            self.written += 1
+            self.last_profile = path
+        return path
+
+    def abandon(self, profile: cProfile.Profile):
+        """Stop profiling without writing anything (e.g. the request failed)"""
+        profile.disable()
+        self._active.release()
+
+    def _prune(self, endpoint_dir: str):
+        # File names start with a timestamp, so they sort oldest first
+        profiles = sorted(glob.glob(os.path.join(endpoint_dir, f"*{PROFILE_SUFFIX}")))
+        for path in profiles[:max(len(profiles) - self.keep, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def status(self) -> Dict:
+        """Settings and counters for the admin API"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "rate": self.rate,
+                "header": self.header,
+                "directory": os.path.abspath(self.directory),
+                "keep_per_endpoint": self.keep,
+                "written": self.written,
+                "skipped_busy": self.skipped_busy,
+                "last_profile": self.last_profile
+            }
+
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+REPORT_MARKER = "PRISMCARE_STARTUP_PHASES "
+
+
+def parse_import_times(stderr: str) -> List[Dict]:
+    """Parse `python -X importtime` output into per-module self/cumulative microseconds"""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2
+            })
+    return modules
+
+
+def startup_report(module: str = "ai_engine", warm_up: bool = True) -> Dict:
+    """
+    Import (and initialize) a module in a fresh interpreter and break its startup down
+
+    The child runs with -X importtime, so every module's own import time is
+    measured by the interpreter; initialization steps wrapped in
+    startup_phase() are reported alongside.
+
+    Returns:
+        Total import time, import time per top-level package, every module
+        and the recorded initialization phases
+    """
+    script = (
+        "import json, sys, profiling\n"
+        f"import {module}\n"
+        # app.py loads (and warms up) the engine in a background thread; wait for it
+        f"if hasattr({module}, 'engine'):\n"
+        f"    {module}.engine.get(timeout=600)\n"
+        "engine = sys.modules.get('ai_engine')\n"
+        f"if {warm_up!r} and engine is not None and not hasattr({module}, 'engine'):\n"
+        f"    engine.warm_up()\n"
+        f"print({REPORT_MARKER!r} + json.dumps(profiling.startup_phases()))\n"
+    )
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    wall_seconds = time.perf_counter() - started
+
+    phases = None
+    for line in completed.stdout.splitlines():
+        if line.startswith(REPORT_MARKER):
+            phases = json.loads(line[len(REPORT_MARKER):])
+    if completed.returncode != 0 or phases is None:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Importing {module} failed:\n" + "\n".join(errors[-20:]))
+
+    modules = parse_import_times(completed.stderr)
+    by_package: Dict[str, int] = {}
+    for entry in modules:
+        package = entry["module"].split(".")[0]
+        by_package[package] = by_package.get(package, 0) + entry["self_us"]
+
+    return {
+        "module": module,
+        "wall_seconds": round(wall_seconds, 3),
+        "import_seconds": round(sum(entry["self_us"] for entry in modules) / 1e6, 3),
+        "by_package": [
+            {"package": package, "seconds": round(us / 1e6, 4)}
+            for package, us in sorted(by_package.items(), key=lambda item: -item[1])
+        ],
+        "modules": modules,
+        "phases": phases
+    }
+
+
+def print_startup_report(report: Dict, top: int = 15):
+    print(f"⏱️  Startup of {report['module']}: {report['wall_seconds']:.2f}s wall, "
+          f"{report['import_seconds']:.2f}s importing")
+
+    print(f"\nImport time by package (top {top}):")
+    for row in report["by_package"][:top]:
+        print(f"  {row['seconds'] * 1000:9.1f}ms  {row['package']}")
+
+    print(f"\nSlowest modules by own import time (top {top}):")
+    for entry in sorted(report["modules"], key=lambda e: -e["self_us"])[:top]:
+        print(f"  {entry['self_us'] / 1000:9.1f}ms  {entry['module']}")
+
+    print("\nInitialization:")
+    for phase in report["phases"]:
+        print(f"  {phase['seconds'] * 1000:9.1f}ms  {phase['phase']}")
+
+
+def print_top(paths: List[str], sort: str = "cumulative", limit: int = 30):
+    """Merge saved request profiles (files or endpoint directories) and print the top functions"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", f"*{PROFILE_SUFFIX}"), recursive=True)))
+        else:
+            files.append(path)
+    if not files:
+        raise SystemExit("No profiles found")
+
+    print(f"📈 {len(files)} profile(s)")
+    pstats.Stats(*files).sort_stats(sort).print_stats(limit)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PrismCare profiling reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup = commands.add_parser("startup", help="Import and initialization time per module")
+    startup.add_argument("--module", default="ai_engine", help="Module to start up (ai_engine, or app for the whole API)")
+    startup.add_argument("--no-warm-up", action="store_true", help="Skip loading the embedding model (ai_engine only; app always warms up)")
+    startup.add_argument("--top", type=int, default=15, help="Rows per table")
+    startup.add_argument("--json", action="store_true", help="Print the full report as JSON")
+
+    top = commands.add_parser("top", help="Merge saved request profiles and print the top functions")
+    top.add_argument("paths", nargs="+", help="Profile files or directories (e.g. profiles/validate_prescription)")
+    top.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, calls)")
+    top.add_argument("-n", "--limit", type=int, default=30, help="Functions to print")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == "startup":
+        report = startup_report(args.module, warm_up=not args.no_warm_up)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_startup_report(report, top=args.top)
+    else:
+        print_top(args.paths, sort=args.sort, limit=args.limit)
@@ -0,0 +1,232 @@
+"""
+Population Re-screening Job
+Streams every patient from ABDM in pages, checks each current regimen
+against the rule set (pairs and 3+ drug rules) on a process pool and
+writes the flagged patients as JSON lines. Restartable from its checkpoint file.
+
+Usage:
+    python rescreen.py --output flagged.jsonl
+    python rescreen.py --rule-id rule_006 --workers 4 --page-size 1000
+    python rescreen.py --output flagged.jsonl --restart     # ignore the checkpoint
+"""
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+import os
+import sys
+import time
+
+import chromadb
+import requests
+
+from abdm_client import ABDMClient, ABDMUnavailable, ABDMTimeout
+from ingest_rules import iter_store
+from rule_index import RuleIndex
+from rule_schema import RULE_STORE_PATH, COLLECTION_NAME
+
+RETRY_BACKOFF_SECONDS = 0.5
+
+_rule_index: Optional[RuleIndex] = None
+
+
+def _init_worker(rules: List[Dict]):
+    """Build the rule index once per worker process"""
+    global _rule_index
+    _rule_index = RuleIndex(rules)
+
+
+def screen_page(records: List[Dict], include_completed: bool = False) -> List[Dict]:
+    """Flagged patients (with the rules they trigger) among one page of records"""
+    flagged = []
+    for record in records:
+        medications = [
+            med['name'] for med in record['medications']
+            if include_completed or med['status'] == 'active'
+        ]
+        matches = _rule_index.screen(medications) if len(medications) > 1 else []
+        if not matches:
+            continue
+        flagged.append({
+            "abha_id": record['abha_id'],
+            "name": record['name'],
+            "age": record['age'],
+            "flags": [
+                {
+                    "rule_id": rule['id'],
+                    "interaction": rule['interaction'],
+                    "risk_level": rule['risk_level'],
+                    "medications": medications_matched
+                }
+                for rule, medications_matched in matches
+            ]
+        })
+    return flagged
+
+
+def load_rules(rule_ids: Optional[List[str]], risk_levels: Optional[List[str]]) -> Tuple[List[Dict], str]:
+    """Rules to screen for, read from the persistent rule store, and the store's version"""
+    collection = chromadb.PersistentClient(path=RULE_STORE_PATH).get_collection(COLLECTION_NAME)
+    rules = [
+        metadata
+        for page in iter_store(collection, include=["metadatas"])
+        for metadata in page["metadatas"]
+        if (not rule_ids or metadata['id'] in rule_ids)
+        and (not risk_levels or metadata['risk_level'] in risk_levels)
+    ]
+    return rules, (collection.metadata or {}).get("rule_set_version")
+
+
+def iter_pages(client: ABDMClient, cursor: Optional[str], page_size: int,
+               retries: int) -> Iterator[Tuple[List[Dict], Optional[str], int]]:
+    """(records, next cursor, total) per page, retrying transient ABDM failures"""
+    while True:
+        for attempt in range(retries + 1):
+            try:
+                records, next_cursor, total = client.fetch_patient_page(cursor, page_size)
+                break
+            except (ABDMUnavailable, ABDMTimeout, requests.HTTPError) as e:
+                if attempt == retries:
+                    raise
+                print(f"⚠️  Page at cursor {cursor} failed ({e}), retrying")
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+        yield records, next_cursor, total
+        if next_cursor is None:
+            return
+        cursor = next_cursor
+
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    """Write the checkpoint atomically (a crash leaves the old or the new file)"""
+    checkpoint["updated_at"] = datetime.now().isoformat()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def run(args) -> Dict:
+    rules, rule_set_version = load_rules(args.rule_id, args.risk_level)
+    if not rules:
+        raise SystemExit("No rules match the selection")
+
+    selection = {"rule_ids": args.rule_id, "risk_levels": args.risk_level,
+                 "include_completed": args.include_completed}
+    checkpoint = None if args.restart else load_checkpoint(args.checkpoint)
+    if checkpoint is not None:
+        if checkpoint["rule_set_version"] != rule_set_version or checkpoint["selection"] != selection:
+            raise SystemExit("Rule set or selection changed since the checkpoint; rerun with --restart")
+        if checkpoint["done"]:
+            print(f"✅ Already complete: {checkpoint['flagged']} flagged of {checkpoint['screened']}")
+            return checkpoint
+        print(f"↩️  Resuming at cursor {checkpoint['cursor']} ({checkpoint['screened']} screened)")
+    else:
+        checkpoint = {
+            "cursor": None, "pages": 0, "screened": 0, "flagged": 0, "output_bytes": 0,
+            "done": False, "rule_set_version": rule_set_version, "selection": selection,
+            "started_at": datetime.now().isoformat()
+        }
+
+    print(f"🔎 Screening against {len(rules)} rules (version {rule_set_version})")
+    client = ABDMClient(args.abdm_url, pool_size=2, deadline=args.timeout)
+    pool = None
+    if args.workers:
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(rules,))
+    else:
+        _init_worker(rules)
+
+    # Lines after the last checkpoint may be from an interrupted run
+    output = open(args.output, "ab")
+    output.truncate(checkpoint["output_bytes"])
+
+    started = time.perf_counter()
+    screened_at_start = checkpoint["screened"]
+
+    def commit(future: Future, next_cursor: Optional[str], page_patients: int, total: int):
+        lines = [json.dumps(patient) + "\n" for patient in future.result()]
+        output.write("".join(lines).encode("utf-8"))
+        output.flush()
+        os.fsync(output.fileno())
+
+        checkpoint.update(
+            cursor=next_cursor,
+            pages=checkpoint["pages"] + 1,
+            screened=checkpoint["screened"] + page_patients,
+            flagged=checkpoint["flagged"] + len(lines),
+            output_bytes=output.tell(),
+            done=next_cursor is None
+        )
+        save_checkpoint(args.checkpoint, checkpoint)
+
+        if checkpoint["pages"] % args.progress_every == 0 or checkpoint["done"]:
+            rate = (checkpoint["screened"] - screened_at_start) / max(time.perf_counter() - started, 1e-9)
+            print(f"  {checkpoint['screened']}/{total} screened, {checkpoint['flagged']} flagged "
+                  f"({rate:.0f} patients/s)")
+
+    # Bounded pipeline: at most 2 pages per worker are in memory at any time
+    in_flight: deque = deque()
+    max_in_flight = max(args.workers * 2, 1)
+    try:
+        for records, next_cursor, total in iter_pages(client, checkpoint["cursor"], args.page_size, args.retries):
+            if pool is None:
+                future: Future = Future()
+                future.set_result(screen_page(records, args.include_completed))
+            else:
+                future = pool.submit(screen_page, records, args.include_completed)
+            in_flight.append((future, next_cursor, len(records), total))
+
+            while len(in_flight) >= max_in_flight:
+                commit(*in_flight.popleft())
+
+        while in_flight:
+            commit(*in_flight.popleft())
+    finally:
+        output.close()
+        client.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return checkpoint
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-screen every ABDM patient against the rule set")
+    parser.add_argument("--abdm-url", default=os.environ.get("PRISMCARE_ABDM_URL", "http://localhost:8080"))
+    parser.add_argument("--output", default="flagged_patients.jsonl")
+    parser.add_argument("--checkpoint", help="Default: <output>.checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--rule-id", action="append", help="Only screen for these rules (repeatable)")
+    parser.add_argument("--risk-level", action="append", choices=["High", "Moderate", "Low"],
+                        help="Only screen for rules at these risk levels (repeatable)")
+    parser.add_argument("--include-completed", action="store_true",
+                        help="Also count completed (not just active) medications")
+    parser.add_argument("--page-size", type=int, default=500, help="Patients per ABDM page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Screening processes (0 screens in this process)")
+    parser.add_argument("--retries", type=int, default=5, help="Retries per failed page")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds per page request")
+    parser.add_argument("--progress-every", type=int, default=20, help="Pages between progress lines")
+    args = parser.parse_args()
+    args.checkpoint = args.checkpoint or f"{args.output}.checkpoint.json"
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print(f"🏥 Re-screening patients from {args.abdm_url} -> {args.output}")
+    result = run(args)
+    print(f"✅ {result['flagged']} of {result['screened']} patients flagged -> {args.output}")
+    sys.exit(0)
@@ -0,0 +1,225 @@
+"""
+Bounded in-process caches
+Memoized analysis results (LRU + TTL) and fetched patient records
+(stale-while-revalidate)
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a fixed TTL
+
+    Least recently used entries are evicted once maxsize is reached;
+    expired entries are dropped lazily when they are looked up.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop one entry (e.g. when the record behind it changes)"""
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry (e.g. when the data behind the cache changes)"""
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+
+class StaleWhileRevalidateCache:
+    """
+    Bounded LRU cache of fetched records with stale-while-revalidate
+
+    Entries are fresh for ttl seconds, then served stale for up to
+    stale_ttl more while one background revalidation runs. Each entry keeps
+    the validator (e.g. ETags) returned by its loader, so revalidating an
+    unchanged record costs a conditional request instead of a full fetch.
+
+    The loader is called as loader(key, validator) and returns
+    (value, validator); value is None when the source reports the record
+    unchanged since that validator.
+    """
+
+    def __init__(self, loader: Callable[[Hashable, Any], Tuple[Optional[Any], Any]],
+                 maxsize: int = 1024, ttl: float = 30.0, stale_ttl: float = 300.0,
+                 max_workers: int = 4):
+        self.loader = loader
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: set = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="revalidate")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.revalidation_errors = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the record for key, loading or revalidating it as needed"""
+        value = self.get_if_present(key)
+        if value is not None:
+            return value
+
+        # Expired entries still carry a validator: a conditional fetch is enough
+        with self._lock:
+            entry = self._data.get(key)
+        validator = entry[3] if entry is not None else None
+
+        value, new_validator = self.loader(key, validator)
+        if value is None:
+            value = entry[2]
+            with self._lock:
+                self.not_modified += 1
+        self.put(key, value, new_validator)
+        return value
+
+    def get_if_present(self, key: Hashable) -> Optional[Any]:
+        """
+        Return a fresh or stale cached record without loading on a miss
+        Stale hits still schedule a background revalidation.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                fresh_until, stale_until, value, validator = entry
+                if now < fresh_until:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < stale_until:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        self._inflight.add(key)
+                        self._executor.submit(self._revalidate, key, validator)
+                    return value
+            self.misses += 1
+            return None
+
+    def _revalidate(self, key: Hashable, validator: Any):
+        try:
+            value, new_validator = self.loader(key, validator)
+            with self._lock:
+                self.revalidations += 1
+                if value is None:
+                    self.not_modified += 1
+                    entry = self._data.get(key)
+                    value = entry[2] if entry is not None else None
+            if value is not None:
+                self.put(key, value, new_validator)
+        except Exception:
+            # Keep serving the stale copy until it runs out
+            with self._lock:
+                self.revalidation_errors += 1
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    def put(self, key: Hashable, value: Any, validator: Any = None):
+        """Store a freshly fetched record"""
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = [now + self.ttl, now + self.ttl + self.stale_ttl, value, validator]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Forget one record"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self) -> Dict:
+        """Hit/miss/revalidation counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "revalidations": self.revalidations,
+                "not_modified": self.not_modified,
+                "revalidation_errors": self.revalidation_errors
+            }
@@ -0,0 +1,113 @@
+"""
+Rolling-window statistics
+Per-minute and per-hour validation, risk and override counts (broken down
+by risk level) for the admin dashboard, kept in the shared stats database
+"""
+
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+
+from stats_store import StatsStore
+
+MINUTE = 60
+HOUR = 3600
+
+# Counter keys are (name, risk level or None)
+Key = Tuple[str, Optional[str]]
+
+
+class RollingStats:
+    """
+    Time-bucketed counters answering "last N minutes/hours" queries
+
+    Every count is added to its minute and its hour bucket in the stats
+    store, which batches them in memory and flushes them to SQLite with the
+    lifetime counters. Windows up to `minutes` long are summed from minute
+    buckets, longer ones from hour buckets, so every query reads O(buckets)
+    rows. Under serve.py all workers write to the same buckets, so each
+    dashboard request sees every worker's traffic (up to one flush interval
+    late for the other workers).
+    """
+
+    def __init__(self, store: StatsStore, minutes: int = 120, hours: int = 168,
+                 clock: Callable[[], float] = time.time):
+        self.store = store
+        self.retention = {MINUTE: minutes, HOUR: hours}
+        self.clock = clock
+        for width, count in self.retention.items():
+            store.set_retention(width, width * count)
+
+    def record(self, risky: int = 0, safe: int = 0, overrides: int = 0,
+               risky_by_level: Optional[Dict[str, int]] = None,
+               overrides_by_level: Optional[Dict[str, int]] = None):
+        """Count validations/overrides in the current minute and hour"""
+        deltas: Dict[Key, int] = {
+            ("validations", None): risky + safe,
+            ("risky_detections", None): risky,
+            ("safe_validations", None): safe,
+            ("overrides", None): overrides
+        }
+        for level, count in (risky_by_level or {}).items():
+            deltas[("risky_detections", level)] = count
+        for level, count in (overrides_by_level or {}).items():
+            deltas[("overrides", level)] = count
+
+        now = self.clock()
+        self.store.increment_buckets({
+            (width, int(now // width) * width, name, level or ""): count
+            for width in self.retention
+            for (name, level), count in deltas.items()
+        })
+
+    def _buckets(self, width: int, count: int) -> List[Tuple[int, Counter]]:
+        """(bucket start, counts) for the last `count` buckets, oldest first"""
+        current = int(self.clock() // width) * width
+        first = current - (min(count, self.retention[width]) - 1) * width
+        stored = self.store.buckets(width, first)
+        return [
+            (start, Counter({
+                (name, level or None): value for (name, level), value in stored.get(start, Counter()).items()
+            }))
+            for start in range(first, current + width, width)
+        ]
+
+    def window(self, seconds: float) -> Dict:
+        """Counts and rates over the trailing window (rounded up to whole buckets)"""
+        width = MINUTE if seconds <= MINUTE * self.retention[MINUTE] else HOUR
+        buckets = max(1, -(-int(seconds) // width))
+        totals: Counter = Counter()
+        for _, counts in self._buckets(width, buckets):
+            totals.update(counts)
+        return summarize(totals, window_seconds=min(buckets, self.retention[width]) * width)
+
+    def series(self, resolution: str = "minute", buckets: int = 60) -> List[Dict]:
+        """Per-bucket counts, oldest first (resolution "minute" or "hour")"""
+        width = HOUR if resolution == "hour" else MINUTE
+        return [
+            dict(summarize(counts, window_seconds=width), start=start)
+            for start, counts in self._buckets(width, buckets)
+        ]
+
+
+def summarize(totals: Counter, window_seconds: int) -> Dict:
+    """Turn (name, risk level) counts into the dashboard's window shape"""
+    validations = totals[("validations", None)]
+    risky = totals[("risky_detections", None)]
+    overrides = totals[("overrides", None)]
+
+    by_risk_level: Dict[str, Dict[str, int]] = {}
+    for (name, level), count in totals.items():
+        if level is not None and count:
+            by_risk_level.setdefault(level, {"risky_detections": 0, "overrides": 0})[name] = count
+
+    return {
+        "window_seconds": window_seconds,
+        "validations": validations,
+        "risky_detections": risky,
+        "safe_validations": totals[("safe_validations", None)],
+        "overrides": overrides,
+        "risk_percentage": round(risky / validations * 100, 2) if validations else 0,
+        "override_rate": round(overrides / risky * 100, 2) if risky else 0,
+        "by_risk_level": by_risk_level
+    }
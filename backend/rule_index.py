@@ -0,0 +1,172 @@
+"""
+Exact Rule Index
+Canonical-ID rule index over rule metadata, shared by the AI engine and the
+offline re-screening job (no Chroma or embedding model needed)
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from drug_normalizer import DrugNormalizer
+from rule_schema import RISK_LEVELS, interaction_drugs
+
+# Lower sorts first: High, Moderate, Low, then anything unrecognized
+SEVERITY_RANK = {level: rank for rank, level in enumerate(RISK_LEVELS)}
+
+
+def pair_key(drug_a: int, drug_b: int) -> Tuple[int, int]:
+    """Build an order-independent key for a pair of canonical drug IDs"""
+    return (drug_a, drug_b) if drug_a <= drug_b else (drug_b, drug_a)
+
+
+def severity_key(rule: Dict) -> Tuple:
+    """Sort key: most severe first, then rules naming more drugs, then by id"""
+    return (
+        SEVERITY_RANK.get(rule['risk_level'], len(SEVERITY_RANK)),
+        -len(interaction_drugs(rule['interaction'])),
+        rule['id']
+    )
+
+
+class RuleIndex:
+    """
+    Immutable rule index over a rule set
+
+    Every drug named by a rule gets a canonical ID (merged with its known
+    aliases). Two-drug rules are indexed by the order-independent pair of
+    IDs. Rules of any size ("A + B + C") are also kept as sorted tuples of
+    distinct drug IDs, with an inverted index from each drug to the rules
+    naming it. Walking the postings of a regimen's drugs counts, per rule,
+    how many of its drugs the regimen has; a rule matches when that count
+    equals its drug count. Only rules reachable through the regimen's own
+    drugs are touched, so the cost grows with the regimen, not with the
+    rule count or the drug vocabulary. A medication naming several drugs
+    (a combination product such as "Aspirin + Clopidogrel 75mg") counts as
+    all of them.
+    """
+
+    def __init__(self, rules: Iterable[Dict]):
+        self.rules: List[Dict] = list(rules)
+        interactions = [interaction_drugs(rule['interaction']) for rule in self.rules]
+        self.normalizer = DrugNormalizer(name for parts in interactions for name in parts)
+        self.pairs: Dict[Tuple[int, int], List[Dict]] = {}
+        # Per rule (by position): its distinct drug IDs, sorted
+        self.rule_drugs: List[Tuple[int, ...]] = []
+        # Drug ID -> positions of the rules that name it
+        self.rules_by_drug: Dict[int, List[int]] = {}
+
+        for position, (rule, parts) in enumerate(zip(self.rules, interactions)):
+            ids = [self.normalizer.resolve(p) for p in parts]
+            drugs = tuple(sorted(set(ids)))
+            for drug_id in drugs:
+                self.rules_by_drug.setdefault(drug_id, []).append(position)
+            self.rule_drugs.append(drugs)
+
+            if len(ids) == 2:
+                self.pairs.setdefault(pair_key(ids[0], ids[1]), []).append(rule)
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def lookup(self, current_med: str, new_medicine: str) -> Optional[List[Dict]]:
+        """
+        Two-drug rules for one drug pair (every ingredient pair for combination products)
+
+        Returns:
+            Matching rules, or None if either name can't be resolved
+        """
+        current_ids = self.normalizer.resolve_all(current_med)
+        new_ids = self.normalizer.resolve_all(new_medicine)
+        if not current_ids or not new_ids:
+            return None
+
+        # Both names are known; no rule for any pair means no interaction
+        rules: List[Dict] = []
+        for current_id in current_ids:
+            for new_id in new_ids:
+                for rule in self.pairs.get(pair_key(current_id, new_id), ()):
+                    if rule not in rules:
+                        rules.append(rule)
+        return rules
+
+    def _resolve(self, medications: Iterable[str]) -> Dict[int, str]:
+        """Canonical drug ID -> first medication name naming it"""
+        resolved: Dict[int, str] = {}
+        for name in medications:
+            for drug_id in self.normalizer.resolve_all(name):
+                resolved.setdefault(drug_id, name)
+        return resolved
+
+    def _hits(self, resolved: Dict[int, str]) -> Counter:
+        """Rule position -> how many of its drugs the regimen contains"""
+        hits: Counter = Counter()
+        for drug_id in resolved:
+            hits.update(self.rules_by_drug.get(drug_id, ()))
+        return hits
+
+    def _named(self, position: int, resolved: Dict[int, str]) -> List[str]:
+        """The regimen's own names for a rule's drugs, in the rule's order"""
+        parts = interaction_drugs(self.rules[position]['interaction'])
+        return [resolved[self.normalizer.resolve(part)] for part in parts]
+
+    def match(self, medications: List[str], new_medicine: str) -> List[Tuple[Dict, List[str]]]:
+        """
+        Every rule (of any size) that adding a new medicine would complete
+
+        Only rules naming the new medicine are considered, so interactions
+        already present in the current regimen aren't reported again.
+
+        Returns:
+            (rule, the medication names that triggered it) per match, most severe first
+        """
+        new_ids = self.normalizer.resolve_all(new_medicine)
+        if not new_ids:
+            return []
+
+        resolved = self._resolve(medications)
+        for new_id in new_ids:
+            resolved[new_id] = new_medicine
+
+        hits = self._hits(resolved)
+        rule_drugs = self.rule_drugs
+        candidates = {position for new_id in new_ids for position in self.rules_by_drug.get(new_id, ())}
+        positions = [
+            position for position in candidates
+            if hits[position] == len(rule_drugs[position])
+        ]
+        matches = [(self.rules[p], self._named(p, resolved)) for p in positions]
+        matches.sort(key=lambda match: severity_key(match[0]))
+        return matches
+
+    def screen(self, medications: List[str]) -> List[Tuple[Dict, List[str]]]:
+        """
+        Every rule (of any size) triggered within one medication list
+
+        Returns:
+            (rule, the medication names that triggered it) per match, most severe first
+        """
+        resolved = self._resolve(medications)
+
+        rule_drugs = self.rule_drugs
+        positions = [
+            position for position, count in self._hits(resolved).items()
+            if count == len(rule_drugs[position])
+        ]
+
+        matches = [(self.rules[p], self._named(p, resolved)) for p in positions]
+        matches.sort(key=lambda match: severity_key(match[0]))
+        return matches
+
+
+if __name__ == '__main__':
+    # Rule drug names that merely mention a known alias must share its ID,
+    # or the pair lookup answers [] ("no interaction") instead of None
+    index = RuleIndex([
+        {"id": "R1", "interaction": "Ibuprofen oral + Lisinopril", "risk_level": "Moderate"},
+        {"id": "R2", "interaction": "Aspirin (low dose) + Warfarin", "risk_level": "High"},
+    ])
+    assert [r["id"] for r in index.lookup("Ibuprofen", "Lisinopril")] == ["R1"]
+    assert [r["id"] for r in index.lookup("Brufen 400mg", "Zestril")] == ["R1"]
+    assert [r["id"] for r in index.lookup("Warfarin", "Ecosprin 75")] == ["R2"]
+    assert [r["id"] for r, _ in index.match(["Warfarin"], "Aspirin")] == ["R2"]
+    print("✅ Rule index resolves rule names through the alias table")
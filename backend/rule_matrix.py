@@ -0,0 +1,75 @@
+"""
+In-memory rule embedding matrix
+Exact nearest-rule search over every rule embedding with one NumPy matrix
+product per request, as an alternative to per-query Chroma searches
+"""
+
+from typing import Dict, List, Sequence
+import numpy as np
+
+PAGE_SIZE = 5000
+
+
+class RuleMatrix:
+    """
+    Immutable (rules x dimensions) float32 matrix plus the rule metadata per row
+
+    Ranking matches Chroma's default L2 space: the nearest rule minimizes
+    |q - r|^2 = |q|^2 + |r|^2 - 2 q.r, i.e. maximizes q.r - |r|^2 / 2, so a
+    whole batch of queries is scored with a single matrix product.
+    """
+
+    def __init__(self, embeddings: Sequence[Sequence[float]], metadatas: List[Dict]):
+        self.metadatas = metadatas
+        self.matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+        if self.matrix.ndim != 2:
+            self.matrix = self.matrix.reshape(len(metadatas), -1)
+        self._half_sq_norms = 0.5 * np.einsum('ij,ij->i', self.matrix, self.matrix)
+
+    @classmethod
+    def from_collection(cls, collection) -> "RuleMatrix":
+        """Load every stored embedding and its metadata, a page at a time"""
+        embeddings: List = []
+        metadatas: List[Dict] = []
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "metadatas"], limit=PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            embeddings.extend(page["embeddings"])
+            metadatas.extend(page["metadatas"])
+            offset += len(page["ids"])
+        return cls(embeddings, metadatas)
+
+    def __len__(self) -> int:
+        return len(self.metadatas)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def top_k(self, query_embeddings: Sequence[Sequence[float]], k: int) -> List[List[Dict]]:
+        """
+        Nearest rules for each query, closest first
+
+        Args:
+            query_embeddings: One embedding per query
+            k: Rules to return per query
+
+        Returns:
+            Rule metadata lists, one per query
+        """
+        if not self.metadatas:
+            return [[] for _ in query_embeddings]
+
+        k = max(1, min(k, len(self.metadatas)))
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        scores = queries @ self.matrix.T
+        scores -= self._half_sq_norms
+
+        # Unordered top-k per row in O(rules), then sort just those k
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        return [[self.metadatas[i] for i in row] for row in top.tolist()]
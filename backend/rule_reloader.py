@@ -0,0 +1,135 @@
+"""
+Rule set hot reload
+Swaps a freshly built rule snapshot into the running AI engine, on demand
+or when the persistent rule store changes, without a restart
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+import threading
+
+STATE_IDLE = "idle"
+STATE_RELOADING = "reloading"
+STATE_FAILED = "failed"
+
+
+class RuleReloader:
+    """
+    Runs rule reloads in the background, one at a time
+
+    trigger() starts a reload (or joins the one already running). A poller
+    thread also compares the store's version stamp with the version being
+    served every `interval` seconds and reloads when they differ, so rules
+    ingested by another process reach every worker without a restart.
+    Requests keep using the snapshot they started with while a reload builds.
+    """
+
+    def __init__(self, engine, interval: float = 30.0):
+        self.engine = engine
+        self.interval = interval
+        self._state = STATE_IDLE
+        self._last_result: Optional[Dict] = None
+        self._error: Optional[str] = None
+        self._last_reload_at: Optional[str] = None
+        self._done = threading.Event()
+        self._done.set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def trigger(self, wait: bool = False, timeout: Optional[float] = None) -> Dict:
+        """
+        Start a reload unless one is already running
+
+        Args:
+            wait: Block until the reload finishes
+            timeout: Longest to wait, in seconds
+
+        Returns:
+            Reload status (see status())
+        """
+        with self._lock:
+            if self._state != STATE_RELOADING:
+                self._state = STATE_RELOADING
+                self._done.clear()
+                threading.Thread(target=self._reload, name="rule-reload", daemon=True).start()
+            done = self._done
+        if wait:
+            done.wait(timeout)
+        return self.status()
+
+    def _reload(self):
+        try:
+            result = self.engine.get().reload_rules()
+        except Exception as e:
+            with self._lock:
+                self._state = STATE_FAILED
+                self._error = str(e)
+            print(f"⚠️  Rule reload failed, still serving the previous rules: {e}")
+        else:
+            with self._lock:
+                self._state = STATE_IDLE
+                self._error = None
+                self._last_result = result
+                self._last_reload_at = datetime.now().isoformat()
+            print(f"🔄 Rules reloaded: {result['previous_version']} -> {result['rule_set_version']} "
+                  f"({result['rules']} rules, {result['seconds']}s)")
+        finally:
+            self._done.set()
+
+    def status(self) -> Dict:
+        """Reload state for the admin API"""
+        with self._lock:
+            status = {
+                "state": self._state,
+                "last_reload": self._last_result,
+                "last_reload_at": self._last_reload_at,
+                "poll_interval_seconds": self.interval
+            }
+            if self._error is not None:
+                status["error"] = self._error
+            return status
+
+    def check(self) -> bool:
+        """Reload if the store holds a different rule set than the one served"""
+        loaded = self.engine.peek()
+        if loaded is None or self._state == STATE_RELOADING:
+            return False
+        stored = loaded.store_version()
+        # None: no collection right now (another process is rebuilding it)
+        if stored is None or stored == loaded.get_rule_set_version():
+            return False
+        self.trigger()
+        return True
+
+    def start(self):
+        """Start the store poller (no-op when polling is disabled)"""
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rule-poller", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Rule store check failed, will retry: {e}")
+
+    def close(self):
+        """Stop the poller (e.g. before fork)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def reopen(self):
+        """Restart the poller in a forked worker"""
+        # A reload running in the parent at fork time has no thread here
+        with self._lock:
+            if self._state == STATE_RELOADING:
+                self._state = STATE_IDLE
+                self._done.set()
+        self._thread = None
+        self.start()
@@ -0,0 +1,138 @@
+"""
+Rule Schema
+Shared rule-store settings, rule validation and content hashing/versioning
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import hashlib
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the store lock becomes a no-op
+    fcntl = None
+
+# Persistent rule store: embeddings are computed once when the store is built
+# and reopened from disk on every later start
+RULE_STORE_PATH = os.environ.get(
+    "PRISMCARE_RULE_STORE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_store")
+)
+COLLECTION_NAME = "medical_rules"
+COLLECTION_DESCRIPTION = "Drug interaction rules and guidelines"
+STORE_LOCK_FILE = "prismcare.lock"
+
+RISK_LEVELS = ("High", "Moderate", "Low")
+REQUIRED_FIELDS = ("id", "interaction", "risk_level", "patient_explanation",
+                   "doctor_explanation", "source")
+OPTIONAL_FIELDS = ("mechanism",)
+
+# Stored alongside each rule so re-imports can skip unchanged rows
+CONTENT_HASH_FIELD = "content_hash"
+
+VERSION_MODULUS = 2 ** 64
+
+
+def open_rule_collection(client, embedding_function=None):
+    """
+    Open the rule collection, creating it empty if it doesn't exist
+
+    Not get_or_create_collection(): given metadata that differs from the
+    stored metadata, it overwrites it, dropping the rule_set_version stamp.
+    """
+    try:
+        return client.get_collection(name=COLLECTION_NAME, embedding_function=embedding_function)
+    except ValueError:
+        return client.create_collection(
+            name=COLLECTION_NAME,
+            metadata={"description": COLLECTION_DESCRIPTION},
+            embedding_function=embedding_function
+        )
+
+
+@contextmanager
+def store_lock():
+    """
+    Exclusive lock on the rule store, shared by every process using it
+
+    Held while a process opens the store for a new snapshot or rebuilds it,
+    so a rebuild (delete + create collection) happens in one process at a
+    time and nobody opens the store halfway through one. Not reentrant.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(RULE_STORE_PATH, exist_ok=True)
+    with open(os.path.join(RULE_STORE_PATH, STORE_LOCK_FILE), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def stored_rule_set_version(client) -> Optional[str]:
+    """
+    Version stamped on the rule store, read without creating or changing anything
+
+    Returns None when there is no collection (e.g. mid-rebuild in another process).
+    """
+    try:
+        collection = client.get_collection(name=COLLECTION_NAME)
+    except ValueError:
+        return None
+    return (collection.metadata or {}).get("rule_set_version")
+
+
+def rule_document(rule: Dict) -> str:
+    """Text that gets embedded for a rule"""
+    return f"{rule['interaction']} - {rule['patient_explanation']}"
+
+
+def interaction_drugs(interaction: str) -> List[str]:
+    """Split an "A + B" interaction into its drug names"""
+    return [part.strip() for part in interaction.split(' + ') if part.strip()]
+
+
+def rule_content_hash(rule: Dict) -> str:
+    """Hash of everything in a rule except its stored content hash"""
+    content = {k: v for k, v in rule.items() if k != CONTENT_HASH_FIELD}
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def combine_version(content_hashes: Iterable[str]) -> str:
+    """
+    Order-independent rule set version from per-rule content hashes
+
+    A modular sum, so it can be computed while streaming rows in any order.
+    """
+    total = 0
+    for content_hash in content_hashes:
+        total = (total + int(content_hash[:16], 16)) % VERSION_MODULUS
+    return f"{total:016x}"
+
+
+def compute_rule_set_version(rules: List[Dict]) -> str:
+    """Stable content hash of a rule set, used as its version stamp"""
+    return combine_version(rule_content_hash(rule) for rule in rules)
+
+
+def validate_rule(row: Dict) -> Optional[str]:
+    """
+    Check one rule row
+
+    Returns:
+        An error message, or None if the row is a valid rule
+    """
+    for field in REQUIRED_FIELDS:
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f"missing {field}"
+    if row['risk_level'] not in RISK_LEVELS:
+        return f"risk_level must be one of {', '.join(RISK_LEVELS)}"
+    if len(interaction_drugs(row['interaction'])) < 2:
+        return "interaction must name at least two drugs joined by ' + '"
+    return None
@@ -0,0 +1,112 @@
+"""
+PrismCare Production Server
+Runs app.py under gunicorn with several worker processes forked after the
+AI engine (rule metadata, pair index, drug normalizer) has been loaded, so
+workers share that memory copy-on-write
+
+What each worker keeps to itself:
+    - Lifetime stats, rolling windows and the override journal are in the
+      shared SQLite database, so every worker reports all traffic.
+    - /metrics is answered by whichever worker gets the scrape. Each worker
+      writes its metrics to PRISMCARE_METRICS_DIR (a fresh temp directory by
+      default) and the answering worker merges them: counters and histograms
+      summed, gauges labelled with the worker pid. Exited workers' counts are
+      kept, so counters never go backwards when workers are recycled.
+    - The result and patient caches (and /api/admin/cache) are per worker.
+
+Usage:
+    python serve.py                      # one worker per CPU core
+    python serve.py --workers 8 --threads 4 --port 5000
+"""
+
+from typing import Dict
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+DEFAULT_WORKERS = int(os.environ.get("PRISMCARE_WORKERS", multiprocessing.cpu_count()))
+DEFAULT_THREADS = int(os.environ.get("PRISMCARE_THREADS", "4"))
+DEFAULT_TIMEOUT = int(os.environ.get("PRISMCARE_WORKER_TIMEOUT", "60"))
+DEFAULT_MAX_REQUESTS = int(os.environ.get("PRISMCARE_MAX_REQUESTS", "0"))
+# How long the parent waits for the AI engine before giving up
+ENGINE_PRELOAD_TIMEOUT = float(os.environ.get("PRISMCARE_ENGINE_PRELOAD_TIMEOUT", "600"))
+
+
+def pre_fork(server, worker):
+    """Parent: nothing that can't cross fork may be open when a worker is forked"""
+    import app
+    app.close_services()
+
+
+def post_fork(server, worker):
+    """Worker: reopen per-process resources (including its own embedding model)"""
+    import app
+    app.reopen_services()
+
+
+def worker_exit(server, worker):
+    """Worker: flush pending stats, drain queued overrides and hand over its metrics before exiting"""
+    import app
+    app.close_services()
+    if app.metrics_collector:
+        app.metrics_collector.mark_dead()
+
+
+class PrismCareServer(BaseApplication):
+    """gunicorn application that preloads app.py and the AI engine in the parent"""
+
+    def __init__(self, options: Dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import app
+        # Block until the engine is loaded so every worker inherits it
+        app.engine.get(timeout=ENGINE_PRELOAD_TIMEOUT)
+        return app.app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the PrismCare API with multiple worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PRISMCARE_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Threads per worker")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="Worker timeout in seconds")
+    parser.add_argument("--max-requests", type=int, default=DEFAULT_MAX_REQUESTS,
+                        help="Recycle a worker after this many requests (0 = never)")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    os.environ.setdefault("PRISMCARE_DEBUG", "0")
+    if not os.environ.get("PRISMCARE_METRICS_DIR"):
+        os.environ["PRISMCARE_METRICS_DIR"] = tempfile.mkdtemp(prefix="prismcare-metrics-")
+    # Counts from a previous run would be added to this one's
+    from metrics import MultiProcessCollector
+    MultiProcessCollector.clear(os.environ["PRISMCARE_METRICS_DIR"])
+
+    print("=" * 60)
+    print(f"🚀 PrismCare API: {args.workers} workers x {args.threads} threads on {args.host}:{args.port}")
+    print("=" * 60)
+    PrismCareServer({
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "timeout": args.timeout,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10,
+        "preload_app": True,
+        "pre_fork": pre_fork,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }).run()
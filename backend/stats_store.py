@@ -0,0 +1,262 @@
+"""
+Validation statistics store
+In-memory counters and time-bucketed counters flushed periodically to
+SQLite (WAL mode)
+"""
+
+from collections import Counter
+from typing import Dict, Optional, Tuple
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+COUNTER_NAMES = (
+    "total_validations",
+    "risky_detections",
+    "safe_validations",
+    "total_overrides"
+)
+
+# Time-bucket counters are keyed (bucket width, bucket start, name, level);
+# level is "" for the all-levels total
+BucketKey = Tuple[int, int, str, str]
+
+# Old buckets are deleted at most this often (seconds)
+PRUNE_INTERVAL = 60
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Open a SQLite connection configured for concurrent, durable writers"""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class StatsStore:
+    """
+    Atomic counters with background flushing
+
+    Increments only touch an in-memory dict under a lock. A flusher thread
+    periodically adds the pending deltas to SQLite in one transaction, so
+    several threads or worker processes can share the same database without
+    losing increments. Pending deltas are flushed again at exit.
+
+    Besides the lifetime counters, it keeps per-time-bucket counters (e.g.
+    per minute and per hour) for rolling windows; buckets older than the
+    retention set for their width are deleted.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = 1.0,
+                 legacy_json: Optional[str] = None):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, int] = {}
+        self._pending_buckets: Dict[BucketKey, int] = {}
+        self._retention: Dict[int, int] = {}
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._atexit_registered = False
+        self._conn: Optional[sqlite3.Connection] = connect(db_path)
+        self._init_schema(legacy_json)
+
+    def _init_schema(self, legacy_json: Optional[str]):
+        """Create the counters table, seeding it from an old stats.json once"""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                "name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stat_buckets ("
+                "width INTEGER NOT NULL, start INTEGER NOT NULL, name TEXT NOT NULL, "
+                "level TEXT NOT NULL, value INTEGER NOT NULL, "
+                "PRIMARY KEY (width, start, name, level))"
+            )
+            existing = {row[0] for row in conn.execute("SELECT name FROM counters")}
+
+            seed: Dict[str, int] = {}
+            if not existing and legacy_json and os.path.exists(legacy_json):
+                with open(legacy_json, 'r') as f:
+                    seed = json.load(f)
+
+            for name in COUNTER_NAMES:
+                if name not in existing:
+                    conn.execute(
+                        "INSERT INTO counters (name, value) VALUES (?, ?)",
+                        (name, int(seed.get(name, 0)))
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def increment(self, **deltas: int):
+        """Add to one or more counters (in memory; flushed in the background)"""
+        with self._lock:
+            for name, delta in deltas.items():
+                if delta:
+                    self._pending[name] = self._pending.get(name, 0) + delta
+
+    def increment_buckets(self, deltas: Dict[BucketKey, int]):
+        """Add to time-bucket counters (in memory; flushed in the background)"""
+        with self._lock:
+            for key, delta in deltas.items():
+                if delta:
+                    self._pending_buckets[key] = self._pending_buckets.get(key, 0) + delta
+
+    def set_retention(self, width: int, seconds: int):
+        """Keep buckets of this width for at least this many seconds"""
+        self._retention[width] = seconds
+
+    def flush(self):
+        """Write pending deltas to SQLite in a single transaction"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                buckets, self._pending_buckets = self._pending_buckets, {}
+            now = time.time()
+            prune = self._retention and now - self._last_prune >= PRUNE_INTERVAL
+            if not pending and not buckets and not prune:
+                return
+
+            conn = self._connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for name, delta in pending.items():
+                    conn.execute(
+                        "INSERT INTO counters (name, value) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                        (name, delta)
+                    )
+                for (width, start, name, level), delta in buckets.items():
+                    conn.execute(
+                        "INSERT INTO stat_buckets (width, start, name, level, value) "
+                        "VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(width, start, name, level) "
+                        "DO UPDATE SET value = value + excluded.value",
+                        (width, start, name, level, delta)
+                    )
+                if prune:
+                    for width, seconds in self._retention.items():
+                        conn.execute(
+                            "DELETE FROM stat_buckets WHERE width = ? AND start < ?",
+                            (width, now - seconds - width)
+                        )
+                conn.execute("COMMIT")
+                if prune:
+                    self._last_prune = now
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Put the deltas back so the next flush retries them
+                self.increment(**pending)
+                self.increment_buckets(buckets)
+                raise
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        The open connection, reconnecting if the store was closed
+
+        serve.py closes the store in the parent before forking; a read that
+        lands there afterwards gets a new connection instead of failing
+        (pre_fork closes it again before the next fork). Call with
+        _flush_lock held.
+        """
+        if self._conn is None:
+            self._conn = connect(self.db_path)
+        return self._conn
+
+    def buckets(self, width: int, since: int) -> Dict[int, Counter]:
+        """
+        Time-bucket counts from every process, by bucket start
+
+        Args:
+            width: Bucket width in seconds
+            since: Earliest bucket start to include
+
+        Returns:
+            {bucket start: Counter of (name, level) -> count}, with this
+            process's unflushed deltas included
+        """
+        with self._flush_lock:
+            rows = self._connection().execute(
+                "SELECT start, name, level, value FROM stat_buckets WHERE width = ? AND start >= ?",
+                (width, since)
+            ).fetchall()
+        with self._lock:
+            rows.extend(
+                (start, name, level, delta)
+                for (key_width, start, name, level), delta in self._pending_buckets.items()
+                if key_width == width and start >= since
+            )
+
+        result: Dict[int, Counter] = {}
+        for start, name, level, value in rows:
+            result.setdefault(start, Counter())[(name, level)] += value
+        return result
+
+    def snapshot(self) -> Dict[str, int]:
+        """Current counter values: flushed totals plus this process's pending deltas"""
+        with self._flush_lock:
+            rows = self._connection().execute("SELECT name, value FROM counters").fetchall()
+        stats = {name: 0 for name in COUNTER_NAMES}
+        stats.update(dict(rows))
+        with self._lock:
+            for name, delta in self._pending.items():
+                stats[name] = stats.get(name, 0) + delta
+        return stats
+
+    def start(self):
+        """Start the background flusher and register a final flush at exit"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stats-flusher", daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠️  Stats flush failed, will retry: {e}")
+
+    def close(self):
+        """Stop the flusher, write out anything still pending and close the connection"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+        with self._flush_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def reopen(self):
+        """
+        Open a fresh connection and flusher after close()
+
+        Used in forked worker processes: SQLite connections and threads must
+        not be carried across fork, so the parent closes the store first.
+        """
+        self._pending = {}
+        self._pending_buckets = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = connect(self.db_path)
+        self.start()
@@ -0,0 +1,132 @@
+"""
+Synthetic Patient Population
+Seeded, columnar (array-backed) patient records for load-testing the mock ABDM server
+"""
+
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Optional
+import random
+
+ID_PREFIX = "SYN"
+ID_DIGITS = 8
+
+FIRST_NAMES = (
+    "Aarav", "Aditi", "Amit", "Ananya", "Arjun", "Deepa", "Farhan", "Gita",
+    "Harpreet", "Ishaan", "Kavya", "Lakshmi", "Manoj", "Meera", "Neha", "Nikhil",
+    "Pooja", "Rahul", "Ravi", "Sana", "Suresh", "Tanvi", "Vikram", "Zoya"
+)
+
+LAST_NAMES = (
+    "Agarwal", "Banerjee", "Chopra", "Das", "Gupta", "Iyer", "Joshi", "Khan",
+    "Kumar", "Menon", "Nair", "Patel", "Reddy", "Shah", "Sharma", "Singh"
+)
+
+GENDERS = ("Male", "Female")
+
+# (medicine, dosage options) - includes every drug named in the built-in rules
+MEDICINES = (
+    ("Warfarin", ("2mg", "5mg")),
+    ("Aspirin", ("75mg", "150mg")),
+    ("Ibuprofen", ("200mg", "400mg")),
+    ("Metformin", ("500mg", "1000mg")),
+    ("Lisinopril", ("5mg", "10mg", "20mg")),
+    ("Potassium Supplements", ("600mg",)),
+    ("Atorvastatin", ("10mg", "20mg", "40mg")),
+    ("Amlodipine", ("5mg", "10mg")),
+    ("Omeprazole", ("20mg",)),
+    ("Levothyroxine", ("50mcg", "100mcg")),
+    ("Paracetamol", ("500mg", "650mg")),
+    ("Hydrochlorothiazide", ("12.5mg", "25mg")),
+    ("Clopidogrel", ("75mg",)),
+    ("Losartan", ("50mg",)),
+    ("Insulin Glargine", ("10 units", "20 units"))
+)
+
+FREQUENCIES = ("Once daily", "Twice daily", "Once daily at night", "As needed")
+STATUSES = ("active", "completed")
+
+EPOCH = date(2020, 1, 1)
+START_DAY_RANGE = (date(2026, 1, 1) - EPOCH).days
+
+
+class SyntheticPopulation:
+    """
+    Columnar store of generated patients
+
+    Each attribute lives in its own typed array instead of per-patient dicts,
+    and medications are stored CSR-style: med_offsets[i]:med_offsets[i + 1]
+    indexes patient i's rows in the medication columns. A million patients
+    take roughly 25 MB.
+    """
+
+    def __init__(self, size: int, seed: int = 42, max_medications: int = 6):
+        self.size = size
+        self.seed = seed
+
+        rng = random.Random(seed)
+        self.first_name = array('B', rng.choices(range(len(FIRST_NAMES)), k=size))
+        self.last_name = array('B', rng.choices(range(len(LAST_NAMES)), k=size))
+        self.age = array('B', rng.choices(range(18, 91), k=size))
+        self.gender = array('B', rng.choices(range(len(GENDERS)), k=size))
+
+        self.med_offsets = array('I', [0])
+        self.med_code = array('B')
+        self.med_dosage = array('B')
+        self.med_frequency = array('B')
+        self.med_start = array('H')
+        self.med_status = array('B')
+
+        for _ in range(size):
+            count = min(int(rng.expovariate(1 / 2.5)), max_medications)
+            for code in rng.sample(range(len(MEDICINES)), count):
+                self.med_code.append(code)
+                self.med_dosage.append(rng.randrange(len(MEDICINES[code][1])))
+                self.med_frequency.append(rng.randrange(len(FREQUENCIES)))
+                self.med_start.append(rng.randrange(START_DAY_RANGE))
+                self.med_status.append(0 if rng.random() < 0.8 else 1)
+            self.med_offsets.append(len(self.med_code))
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def patient_id(index: int) -> str:
+        """ABHA-style ID for the patient at index"""
+        return f"{ID_PREFIX}{index:0{ID_DIGITS}d}"
+
+    def index_of(self, patient_id: str) -> Optional[int]:
+        """Row index for an ID, or None if it isn't one of ours"""
+        if not patient_id.startswith(ID_PREFIX) or len(patient_id) != len(ID_PREFIX) + ID_DIGITS:
+            return None
+        digits = patient_id[len(ID_PREFIX):]
+        if not digits.isdigit():
+            return None
+        index = int(digits)
+        return index if index < self.size else None
+
+    def record(self, index: int) -> Dict:
+        """Materialize one patient in the PATIENTS_DB dict format"""
+        medications = []
+        for row in range(self.med_offsets[index], self.med_offsets[index + 1]):
+            medicine, dosages = MEDICINES[self.med_code[row]]
+            medications.append({
+                "medicine": medicine,
+                "dosage": dosages[self.med_dosage[row]],
+                "frequency": FREQUENCIES[self.med_frequency[row]],
+                "start_date": (EPOCH + timedelta(days=self.med_start[row])).isoformat(),
+                "status": STATUSES[self.med_status[row]]
+            })
+
+        return {
+            "id": self.patient_id(index),
+            "name": f"{FIRST_NAMES[self.first_name[index]]} {LAST_NAMES[self.last_name[index]]}",
+            "age": self.age[index],
+            "gender": GENDERS[self.gender[index]],
+            "medication_history": medications
+        }
+
+    def get(self, patient_id: str) -> Optional[Dict]:
+        """Dict-style lookup by ID"""
+        index = self.index_of(patient_id)
+        return self.record(index) if index is not None else None